@@ -1,74 +1,120 @@
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
-import json
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import hashlib
 import random
 import string
 import time
-import requests
 from dotenv import load_dotenv
 
+from code_store import EXPIRED, VALID, CodeStore, SQLiteCodeStore
+from journal import Journal
+from logs import configure_logging
+from metrics import REGISTRY, RequestMetrics
+from outbox import BREVO_URL, Outbox
+from passwords import PasswordHasher
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets
+from tokens import REFRESH, TokenSigner
+from user_store import UserStore
+from valuation import TTLCache, ValuationEngine
+
 load_dotenv()
+log = configure_logging(os.getenv("LOG_LEVEL", "INFO"))
 
 app = Flask(__name__)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.getenv("PROXY_COUNT", "0")))
 CORS(app, origins=["http://localhost:3000", "https://turbinix.one"], supports_credentials=True)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback-secret")
+app.secret_key = os.getenv("FLASK_SECRET_KEY")
+if not app.secret_key:
+    raise RuntimeError("FLASK_SECRET_KEY must be set: it signs sessions and API tokens")
+RequestMetrics(
+    profile_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    profile_slow_ms=float(os.getenv("PROFILE_SLOW_MS", "500")),
+    profile_dir=os.getenv("PROFILE_DIR", "profiles"),
+).init_app(app)
+tokens = TokenSigner(
+    app.secret_key,
+    access_ttl=int(os.getenv("ACCESS_TOKEN_TTL", "900")),
+    refresh_ttl=int(os.getenv("REFRESH_TOKEN_TTL", str(30 * 24 * 3600))),
+)
 
 USERS_FILE = 'users.json'
 CODES_FILE = 'codes.json'
-
-def load_json(filename):
-    if os.path.exists(filename):
-        with open(filename, 'r') as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return []
-    return []
-
-def save_json(data, filename):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+PROPERTY_CACHE_SECONDS = 300
+MAX_PROPERTY_BATCH = 500
+MAX_USERNAME_BATCH = 100
+MAX_USERNAME_SUGGESTIONS = 20
+
+hasher = PasswordHasher(
+    n=int(os.getenv("SCRYPT_N", str(2 ** 14))),
+    r=int(os.getenv("SCRYPT_R", "8")),
+    p=int(os.getenv("SCRYPT_P", "1")),
+    workers=int(os.getenv("HASH_WORKERS", "2")),
+)
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return hasher.hash(password)
 
 def generate_code(length=6):
     return ''.join(random.choices(string.digits, k=length))
 
+outbox = Outbox(
+    os.getenv("BREVO_API_URL", BREVO_URL),
+    os.getenv("BREVO_API_KEY"),
+    workers=int(os.getenv("EMAIL_WORKERS", "4")),
+    batch_size=int(os.getenv("EMAIL_BATCH_SIZE", "1")),
+    shutdown_timeout=float(os.getenv("EMAIL_SHUTDOWN_TIMEOUT", "10")),
+)
+
 def send_email(email, subject, html_content):
-    brevo_key = os.getenv("BREVO_API_KEY")
-    if not brevo_key:
-        print("❌ Missing Brevo API Key")
-        return False
-
-    res = requests.post(
-        "https://api.brevo.com/v3/smtp/email",
-        headers={
-            "accept": "application/json",
-            "api-key": brevo_key,
-            "content-type": "application/json"
-        },
-        json={
-            "sender": {"name": "Turbinix", "email": "no-reply@turbinix.one"},
-            "to": [{"email": email}],
-            "subject": subject,
-            "htmlContent": html_content
-        }
-    )
-    print(f"📬 Email to {email}: {res.status_code}")
-    return res.status_code < 400
-
-users = load_json(USERS_FILE)
-codes = load_json(CODES_FILE)
+    return outbox.enqueue(email, subject, html_content)
+
+users_journal = Journal(USERS_FILE, key='username')
+users = UserStore(users_journal.load(), journal=users_journal)
+if os.getenv("CODES_BACKEND") == "sqlite":
+    codes = SQLiteCodeStore(os.getenv("CODES_DB", "codes.db"))
+else:
+    codes_journal = Journal(CODES_FILE, key='email')
+    codes = CodeStore(codes_journal.load(), journal=codes_journal)
+codes.purge(time.time())
+if os.getenv("RATE_LIMIT_BACKEND") == "sqlite":
+    buckets = SQLiteBuckets(os.getenv("RATE_LIMIT_DB", "ratelimit.db"))
+else:
+    buckets = MemoryBuckets()
+limiter = RateLimiter(buckets, enabled=os.getenv("RATE_LIMIT_ENABLED", "1") != "0")
+valuations = ValuationEngine(cache=TTLCache(ttl=int(os.getenv("VALUATION_CACHE_TTL", "3600"))))
+
+REGISTRY.gauge('turbinix_users', 'Registered users.', lambda: len(users))
+REGISTRY.gauge('turbinix_outbox_queued', 'Emails waiting in the outbox.', lambda: outbox.queue.qsize())
+REGISTRY.counter_func('turbinix_outbox_sent_total', 'Emails delivered by this worker.', lambda: outbox.sent)
+REGISTRY.counter_func('turbinix_outbox_failed_total', 'Emails dead-lettered by this worker.', lambda: outbox.failed)
 
 @app.route('/api/check-username/<username>', methods=['GET'])
+@limiter.limit(ip="120/minute")
 def check_username(username):
-    available = not any(u['username'] == username for u in users)
+    available = not users.username_taken(username)
+    suggest = request.args.get('suggest', type=int)
+    if suggest and not available:
+        suggestions = users.suggest_usernames(username, min(suggest, MAX_USERNAME_SUGGESTIONS))
+        return jsonify({"available": available, "suggestions": suggestions}), 200
     return jsonify({"available": available}), 200
 
+@app.route('/api/check-usernames', methods=['POST'])
+@limiter.limit(ip="30/minute")
+def check_usernames():
+    data = request.get_json()
+    usernames = data.get('usernames') if isinstance(data, dict) else None
+
+    if not isinstance(usernames, list) or not all(isinstance(u, str) for u in usernames):
+        return jsonify({"error": "usernames must be a list of strings"}), 400
+    if len(usernames) > MAX_USERNAME_BATCH:
+        return jsonify({"error": f"At most {MAX_USERNAME_BATCH} usernames per request"}), 400
+
+    return jsonify({"available": users.check_usernames(usernames)}), 200
+
 @app.route('/api/send-code', methods=['POST'])
+@limiter.limit(ip="5/minute", identifier="3/minute", field='email')
 def send_code():
     try:
         data = request.get_json()
@@ -78,14 +124,9 @@ def send_code():
         if not email:
             return jsonify({"error": "Email required"}), 400
 
-        for record in codes:
-            if record['email'] == email and now - record['timestamp'] < 60:
-                return jsonify({"error": "Please wait before requesting another code."}), 429
-
         code = generate_code()
-        codes[:] = [c for c in codes if c['email'] != email]
-        codes.append({"email": email, "code": code, "timestamp": now})
-        save_json(codes, CODES_FILE)
+        if codes.issue(email, code, now) is None:
+            return jsonify({"error": "Please wait before requesting another code."}), 429
 
         html = f"""
         <p>Hi there,</p>
@@ -101,10 +142,11 @@ def send_code():
             return jsonify({"error": "Failed to send email"}), 500
 
     except Exception as e:
-        print("❌ send-code exception:", str(e))
+        log.exception("send-code failed", extra={"route": "send_code"})
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 @app.route('/api/verify-code', methods=['POST'])
+@limiter.limit(ip="20/minute", identifier="10/minute", field='email')
 def verify_code():
     data = request.get_json()
     email = data.get('email')
@@ -114,46 +156,49 @@ def verify_code():
     if not email or not code:
         return jsonify({"verified": False, "error": "Missing fields"}), 400
 
-    for record in codes:
-        if record['email'] == email and record['code'] == code:
-            if now - record['timestamp'] > 600:
-                codes.remove(record)
-                save_json(codes, CODES_FILE)
-                return jsonify({"verified": False, "error": "Code expired"}), 400
-            return jsonify({"verified": True}), 200
+    status = codes.check(email, code, now)
+    if status == VALID:
+        return jsonify({"verified": True}), 200
+    if status == EXPIRED:
+        return jsonify({"verified": False, "error": "Code expired"}), 400
 
     return jsonify({"verified": False, "error": "Invalid code"}), 400
 
 @app.route('/api/register', methods=['POST'])
+@limiter.limit(ip="10/minute")
 def register():
     try:
         data = request.get_json()
         email = data['email']
         username = data['username']
-        password = hash_password(data['password'])
+        password = data['password']
         first_name = data['first_name']
         last_name = data['last_name']
 
-        if any(u.get('username') == username for u in users):
+        if users.username_taken(username):
             return jsonify({"error": "Username already taken"}), 409
 
-        if any(u.get('email') == email for u in users):
+        if users.email_taken(email):
             return jsonify({"error": "Email already used"}), 409
 
-        users.append({
-            'username': username,
-            'email': email,
-            'password': password,
-            'first_name': first_name,
-            'last_name': last_name
-        })
-        save_json(users, USERS_FILE)
+        try:
+            users.add({
+                'username': username,
+                'email': email,
+                'password': hash_password(password),
+                'first_name': first_name,
+                'last_name': last_name
+            })
+        except ValueError as e:
+            # Lost a race with a concurrent registration for the same name or email.
+            return jsonify({"error": str(e)}), 409
         return jsonify({"message": "User registered successfully"}), 201
     except Exception as e:
-        print("❌ register error:", str(e))
+        log.exception("register failed", extra={"route": "register"})
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/login', methods=['POST'])
+@limiter.limit(ip="20/minute", identifier="10/minute", field='identifier')
 def login():
     try:
         data = request.get_json()
@@ -163,52 +208,81 @@ def login():
         if not identifier or not password:
             return jsonify({"error": "Missing fields"}), 400
 
-        hashed_password = hash_password(password)
-
-        for user in users:
-            if (user.get('username') == identifier or user.get('email') == identifier) and user.get('password') == hashed_password:
-                return jsonify({
-                    "message": "Login successful",
-                    "username": user['username'],
-                    "first_name": user.get('first_name', ''),
-                    "last_name": user.get('last_name', '')
-                }), 200
+        user = users.get_by_identifier(identifier)
+        matches, needs_rehash = hasher.verify(password, user.get('password') if user else None)
+        if matches:
+            if needs_rehash:
+                users.set_password(user['email'], hash_password(password))
+            return jsonify({
+                "message": "Login successful",
+                "username": user['username'],
+                "first_name": user.get('first_name', ''),
+                "last_name": user.get('last_name', ''),
+                **tokens.issue_pair(user['username'], user.get('password_changed_at', 0))
+            }), 200
 
         return jsonify({"error": "Invalid credentials"}), 401
     except Exception as e:
-        print("❌ login error:", str(e))
+        log.exception("login failed", extra={"route": "login"})
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/token/refresh', methods=['POST'])
+@limiter.limit(ip="30/minute")
+def refresh_token():
+    data = request.get_json()
+    claims = tokens.verify(data.get('refresh_token'), REFRESH)
+    user = users.get_by_username(claims['sub']) if claims is not None else None
+    # A password reset bumps password_changed_at, retiring older refresh tokens.
+    if user is None or claims.get('pwd', 0) != user.get('password_changed_at', 0):
+        return jsonify({"error": "Invalid or expired refresh token"}), 401
+
+    tokens.revoke(claims)
+    return jsonify(tokens.issue_pair(user['username'], user.get('password_changed_at', 0))), 200
+
+@app.route('/api/logout', methods=['POST'])
+@tokens.required
+def logout():
+    tokens.revoke(g.token)
+    data = request.get_json(silent=True) or {}
+    refresh = tokens.verify(data.get('refresh_token'), REFRESH)
+    if refresh is not None and refresh['sub'] == g.token['sub']:
+        tokens.revoke(refresh)
+    return jsonify({"message": "Logged out"}), 200
+
+@app.route('/api/me', methods=['GET'])
+@tokens.required
+def me():
+    return jsonify({"username": g.token['sub'], "expires_at": g.token['exp']}), 200
+
 @app.route('/api/property-value', methods=['GET'])
 def property_value():
-    address = request.args.get('address', '').lower()
-
-    mock_properties = {
-        '123 main st': {
-            'value': 542000,
-            'change': '+3.2%',
-            'image': 'https://source.unsplash.com/featured/400x200?house',
-        },
-        '456 elm st': {
-            'value': 610000,
-            'change': '-1.1%',
-            'image': 'https://source.unsplash.com/featured/400x200?modern-home',
-        }
-    }
-
-    result = mock_properties.get(address, {
-        'value': 480000,
-        'change': '+1.0%',
-        'image': 'https://images.unsplash.com/photo-1600607687920-4ff6f5ef9c07',
-    })
-
-    return jsonify(result)
+    result = valuations.value(request.args.get('address', ''))
+
+    response = jsonify(result)
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = PROPERTY_CACHE_SECONDS
+    return response.make_conditional(request)
+
+@app.route('/api/property-values', methods=['POST'])
+def property_values():
+    data = request.get_json()
+    addresses = data.get('addresses') if isinstance(data, dict) else None
+
+    if not isinstance(addresses, list) or not all(isinstance(a, str) for a in addresses):
+        return jsonify({"error": "addresses must be a list of strings"}), 400
+    if len(addresses) > MAX_PROPERTY_BATCH:
+        return jsonify({"error": f"At most {MAX_PROPERTY_BATCH} addresses per request"}), 400
+
+    results = valuations.value_many(addresses)
+    return jsonify({"results": [{"address": a, **r} for a, r in zip(addresses, results)]}), 200
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ok"}), 200
 
 @app.route('/api/request-reset-code', methods=['POST'])
+@limiter.limit(ip="5/minute", identifier="3/minute", field='email')
 def request_reset_code():
     data = request.get_json()
     email = data.get('email')
@@ -217,17 +291,12 @@ def request_reset_code():
     if not email:
         return jsonify({"error": "Email required"}), 400
 
-    if not any(u['email'] == email for u in users):
+    if not users.email_taken(email):
         return jsonify({"error": "No user with that email"}), 404
 
-    for record in codes:
-        if record['email'] == email and now - record['timestamp'] < 60:
-            return jsonify({"error": "Please wait before requesting another code."}), 429
-
     code = generate_code()
-    codes[:] = [c for c in codes if c['email'] != email]
-    codes.append({"email": email, "code": code, "timestamp": now})
-    save_json(codes, CODES_FILE)
+    if codes.issue(email, code, now) is None:
+        return jsonify({"error": "Please wait before requesting another code."}), 429
 
     html = f"""
     <p>We received a request to reset your Turbinix password.</p>
@@ -242,6 +311,7 @@ def request_reset_code():
         return jsonify({"error": "Failed to send reset code"}), 500
 
 @app.route('/api/reset-password', methods=['POST'])
+@limiter.limit(ip="10/minute", identifier="5/minute", field='email')
 def reset_password():
     data = request.get_json()
     email = data.get('email')
@@ -252,25 +322,21 @@ def reset_password():
     if not email or not code or not new_password:
         return jsonify({"error": "Missing fields"}), 400
 
-    for record in codes:
-        if record['email'] == email and record['code'] == code:
-            if now - record['timestamp'] > 600:
-                codes.remove(record)
-                save_json(codes, CODES_FILE)
-                return jsonify({"error": "Code expired. Please request a new one."}), 400
+    status = codes.check(email, code, now)
+    if status == EXPIRED:
+        return jsonify({"error": "Code expired. Please request a new one."}), 400
 
-            for user in users:
-                if user['email'] == email:
-                    user['password'] = hash_password(new_password)
-                    codes.remove(record)
-                    save_json(users, USERS_FILE)
-                    save_json(codes, CODES_FILE)
-                    print("✅ Password reset for", email)
-                    return jsonify({"message": "Password updated!"}), 200
+    if status == VALID:
+        if users.set_password(email, hash_password(new_password), changed_at=now):
+            codes.consume(email)
+            log.info("password reset", extra={"email": email})
+            return jsonify({"message": "Password updated!"}), 200
 
-            return jsonify({"error": "User not found"}), 404
+        return jsonify({"error": "User not found"}), 404
 
     return jsonify({"error": "Invalid or already used code"}), 400
 
 if __name__ == '__main__':
+    # A hashing pool would re-run this whole script in each of its children.
+    hasher.workers = 0
     app.run(debug=True)
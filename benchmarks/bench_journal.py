@@ -0,0 +1,53 @@
+"""Per-write cost of a journal append vs. rewriting the whole file.
+
+    python -m benchmarks.bench_journal [--max 100000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from journal import Journal
+
+
+def make_records(n):
+    return [{'email': f'user{i}@example.com', 'code': '123456', 'timestamp': 0.0} for i in range(n)]
+
+
+def rewrite(records, path):
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=100_000)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'records':>9} {'journal us/write':>17} {'rewrite us/write':>17}")
+    n = 1000
+    while n <= args.max:
+        records = make_records(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'codes.json')
+            journal = Journal(path, key='email', compact_min_bytes=1 << 40)
+            journal.compact(records)
+
+            start = time.perf_counter()
+            for i in range(args.writes):
+                journal.put(records[i % n])
+            journal_us = (time.perf_counter() - start) / args.writes * 1e6
+
+            writes = max(1, args.writes // 20)
+            start = time.perf_counter()
+            for _ in range(writes):
+                rewrite(records, path)
+            rewrite_us = (time.perf_counter() - start) / writes * 1e6
+        print(f"{n:>9} {journal_us:>17.1f} {rewrite_us:>17.1f}")
+        n *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Overhead of request instrumentation and spans.
+
+    python -m benchmarks.bench_metrics
+"""
+import argparse
+import time
+import timeit
+
+from flask import Flask, jsonify
+
+from metrics import Registry, RequestMetrics
+
+
+def make_app(instrumented):
+    app = Flask(__name__)
+
+    @app.route('/api/health')
+    def health():
+        return jsonify({"status": "ok"}), 200
+
+    if instrumented:
+        RequestMetrics(Registry()).init_app(app)
+    return app
+
+
+def per_request_us(app, requests):
+    client = app.test_client()
+    for _ in range(200):
+        client.get('/api/health')
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/health')
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=7)
+    args = parser.parse_args()
+
+    # Alternate the two apps and keep the best run of each, so background
+    # noise hits both sides equally.
+    apps = {False: make_app(False), True: make_app(True)}
+    best = {False: float('inf'), True: float('inf')}
+    for _ in range(args.rounds):
+        for instrumented in (False, True):
+            best[instrumented] = min(best[instrumented], per_request_us(apps[instrumented], args.requests))
+    plain, instrumented = best[False], best[True]
+    print(f"plain request:        {plain:8.1f} us")
+    print(f"instrumented request: {instrumented:8.1f} us  (+{instrumented - plain:.1f} us, "
+          f"{(instrumented - plain) / plain * 100:.1f}%)")
+
+    registry = Registry()
+
+    def spanned():
+        with registry.span('bench'):
+            pass
+
+    calls = 200_000
+    print(f"span:                 {min(timeit.repeat(spanned, number=calls, repeat=3)) / calls * 1e6:8.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Caller-side latency of send_email: inline requests.post vs. the outbox.
+
+    python -m benchmarks.bench_outbox [--messages 40]
+
+Runs against a local Brevo stub at several upstream latencies; the outbox
+column should stay flat while the inline column tracks the upstream.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from benchmarks.brevo_stub import BrevoStub
+from outbox import Outbox
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'upstream ms':>11} {'inline ms/call':>15} {'outbox ms/call':>15} {'drain s':>8} {'delivered':>9}")
+    for latency in (0.0, 0.05, 0.2):
+        stub = BrevoStub(latency=latency).start()
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = Outbox(stub.url, 'bench-key', workers=args.workers,
+                            dead_letter_path=os.path.join(tmp, 'dead.jsonl'))
+            outbox.enqueue('warmup@example.com', 'Warmup', '<p>hi</p>')
+            outbox.flush()
+
+            inline_calls = max(1, args.messages // 10)
+            start = time.perf_counter()
+            for i in range(inline_calls):
+                requests.post(stub.url, json={"to": [{"email": f"inline{i}@example.com"}]}, timeout=10)
+            inline_ms = (time.perf_counter() - start) / inline_calls * 1e3
+
+            start = time.perf_counter()
+            for i in range(args.messages):
+                outbox.enqueue(f'user{i}@example.com', 'Code', '<p>123456</p>')
+            outbox_ms = (time.perf_counter() - start) / args.messages * 1e3
+            outbox.flush()
+            drain = time.perf_counter() - start
+        stub.shutdown()
+        print(f"{latency * 1e3:>11.0f} {inline_ms:>15.2f} {outbox_ms:>15.3f} {drain:>8.2f} {outbox.sent - 1:>9}")
+
+
+if __name__ == '__main__':
+    main()
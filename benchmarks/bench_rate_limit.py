@@ -0,0 +1,38 @@
+"""Cost of one rate limit check for each bucket store.
+
+    python -m benchmarks.bench_rate_limit
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets, parse_rate
+
+
+def bench(limiter, calls, keys):
+    rate = parse_rate("10/second")
+    start = time.perf_counter()
+    for i in range(calls):
+        limiter.check(f"login:ip:10.0.{i % keys}", rate)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200_000)
+    parser.add_argument('--keys', type=int, default=50_000)
+    args = parser.parse_args()
+
+    memory = MemoryBuckets(max_buckets=args.keys // 2)
+    print(f"memory: {bench(RateLimiter(memory), args.calls, args.keys):8.2f} us/check "
+          f"({len(memory)} buckets kept of {args.keys} keys)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteBuckets(os.path.join(tmp, 'ratelimit.db'))
+        calls = args.calls // 20
+        print(f"sqlite: {bench(RateLimiter(sqlite), calls, args.keys):8.2f} us/check")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""Cost of authenticating a call with a token vs. re-verifying the password.
+
+    python -m benchmarks.bench_tokens
+"""
+import argparse
+import timeit
+
+from passwords import PasswordHasher
+from tokens import TokenSigner
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=50_000)
+    args = parser.parse_args()
+
+    signer = TokenSigner('bench-secret')
+    token = signer.issue('someuser')
+    for i in range(1000):
+        signer.revoke(signer.verify(signer.issue(f'user{i}')))
+    token_us = min(timeit.repeat(lambda: signer.verify(token), number=args.calls, repeat=3)) / args.calls * 1e6
+
+    hasher = PasswordHasher(workers=0)
+    stored = hasher.hash('correct horse battery staple')
+    password_us = min(timeit.repeat(lambda: hasher.verify('correct horse battery staple', stored),
+                                    number=3, repeat=3)) / 3 * 1e6
+
+    print(f"token verify:    {token_us:>10.2f} us/call")
+    print(f"password verify: {password_us:>10.0f} us/call (scrypt N={hasher.n})")
+    print(f"ratio:           {password_us / token_us:>10.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Lookup latency of UserStore vs. the old linear scan, from 1k to 1M users.
+
+    python -m benchmarks.bench_user_store [--max 1000000]
+"""
+import argparse
+import random
+import timeit
+
+from user_store import UserStore
+
+
+def make_users(n):
+    return [{
+        'username': f'user{i}',
+        'email': f'user{i}@example.com',
+        'password': 'x',
+        'first_name': 'First',
+        'last_name': 'Last',
+    } for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'users':>9} {'store us/op':>12} {'scan us/op':>12}")
+    n = 1000
+    while n <= args.max:
+        raw = make_users(n)
+        store = UserStore(raw)
+        names = [f'user{random.randrange(n)}' for _ in range(args.lookups)]
+        emails = [f'USER{random.randrange(n)}@example.com' for _ in range(args.lookups)]
+
+        def indexed():
+            for name, email in zip(names, emails):
+                store.username_taken(name)
+                store.get_by_email(email)
+
+        scan_names = names[:20]
+
+        def scan():
+            for name in scan_names:
+                any(u['username'] == name for u in raw)
+
+        store_us = min(timeit.repeat(indexed, number=1, repeat=3)) / args.lookups * 1e6
+        scan_us = min(timeit.repeat(scan, number=1, repeat=3)) / len(scan_names) * 1e6
+        print(f"{n:>9} {store_us:>12.3f} {scan_us:>12.1f}")
+        n *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""UsernameIndex lookup, suggestion and insert latency from 1k to 1M names.
+
+    python -m benchmarks.bench_username_index [--max 1000000]
+"""
+import argparse
+import random
+import time
+import timeit
+
+from username_index import UsernameIndex
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{'names':>9} {'build s':>8} {'hit us':>8} {'miss us':>8} {'suggest us':>11} {'insert us':>10}")
+    n = 1000
+    while n <= args.max:
+        start = time.perf_counter()
+        index = UsernameIndex(f'user{i}' for i in range(n))
+        build = time.perf_counter() - start
+
+        hits = [f'User{random.randrange(n)}' for _ in range(args.lookups)]
+        misses = [f'free{i}' for i in range(args.lookups)]
+        hit_us = min(timeit.repeat(lambda: [h in index for h in hits], number=1, repeat=3)) / args.lookups * 1e6
+        miss_us = min(timeit.repeat(lambda: [m in index for m in misses], number=1, repeat=3)) / args.lookups * 1e6
+        suggest_us = min(timeit.repeat(lambda: index.suggest('user42', 5), number=100, repeat=3)) / 100 * 1e6
+
+        inserts = [f'new{i}' for i in range(1000)]
+        start = time.perf_counter()
+        for name in inserts:
+            index.add(name)
+        insert_us = (time.perf_counter() - start) / len(inserts) * 1e6
+
+        print(f"{n:>9} {build:>8.2f} {hit_us:>8.2f} {miss_us:>8.2f} {suggest_us:>11.1f} {insert_us:>10.2f}")
+        n *= 10
+
+
+if __name__ == '__main__':
+    main()
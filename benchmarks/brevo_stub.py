@@ -0,0 +1,87 @@
+"""Local stand-in for the Brevo transactional email API.
+
+    python -m benchmarks.brevo_stub --port 8025 --latency 0.3
+
+Point the app at it with BREVO_API_URL=http://127.0.0.1:8025/v3/smtp/email.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class BrevoStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, failure_rate=0.0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.received = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v3/smtp/email"
+
+    def handle_error(self, request, client_address):
+        # Servers under test are killed between runs with keep-alive
+        # connections still open; that isn't worth a traceback.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+        if random.random() < server.failure_rate:
+            self._reply(503, {"message": "stub failure"})
+            return
+        payload = json.loads(body)
+        recipients = [v['to'][0]['email'] for v in payload.get('messageVersions', [])] or \
+            [payload['to'][0]['email']]
+        with server.lock:
+            server.received.extend(recipients)
+        self._reply(201, {"messageId": f"<stub-{len(server.received)}@turbinix>"})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    stub = BrevoStub(args.port, args.latency, args.failure_rate)
+    print(f"Brevo stub listening on {stub.url}")
+    stub.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
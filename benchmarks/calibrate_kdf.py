@@ -0,0 +1,69 @@
+"""Pick scrypt cost parameters for a target per-hash latency.
+
+    python -m benchmarks.calibrate_kdf [--target-ms 100] [--workers N] [--max-mem-mib 256]
+
+Times one hash at increasing N, picks the largest N under the target whose
+memory (128 * r * N bytes per hash, for every one of `--workers` processes)
+fits in `--max-mem-mib`, then measures how many hashes per second the pool
+(default: all cores) sustains with it. Prints the env vars to deploy with.
+"""
+import argparse
+import os
+import time
+
+from passwords import PasswordHasher, scrypt
+
+
+def time_hash(n, r, p, rounds=3):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        scrypt('correct horse battery staple', os.urandom(16), n, r, p)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target-ms', type=float, default=100)
+    parser.add_argument('--r', type=int, default=8)
+    parser.add_argument('--p', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--hashes', type=int, default=64)
+    parser.add_argument('--max-mem-mib', type=float, default=256,
+                        help="memory all pool workers may use for hashing at once")
+    args = parser.parse_args()
+
+    print(f"{'N':>8} {'ms/hash':>8} {'memory MiB':>10}")
+    chosen = 2 ** 12
+    n = 2 ** 12
+    while n <= 2 ** 20:
+        mib = 128 * args.r * n / 2 ** 20
+        if n > chosen and mib * args.workers > args.max_mem_mib:
+            print(f"{n:>8} {'-':>8} {mib:>10.0f}  exceeds --max-mem-mib with {args.workers} workers")
+            break
+        ms = time_hash(n, args.r, args.p) * 1e3
+        print(f"{n:>8} {ms:>8.1f} {mib:>10.0f}")
+        if ms > args.target_ms:
+            break
+        chosen = n
+        n *= 2
+
+    hasher = PasswordHasher(n=chosen, r=args.r, p=args.p, workers=args.workers)
+    hasher.hash('warmup')
+    pool = hasher._pool
+    start = time.perf_counter()
+    futures = [pool.submit(scrypt, 'password', os.urandom(16), chosen, args.r, args.p)
+               for _ in range(args.hashes)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - start
+
+    print(f"\npool of {args.workers} on {os.cpu_count()} cores: "
+          f"{args.hashes / elapsed:.1f} hashes/s at N={chosen}")
+    print(f"peak hashing memory: {128 * args.r * chosen * args.workers / 2 ** 20:.0f} MiB")
+    print(f"SCRYPT_N={chosen} SCRYPT_R={args.r} SCRYPT_P={args.p} HASH_WORKERS={args.workers}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare two benchmarks.run result files.
+
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+
+Prints throughput and p99 per (dataset size, config, route) and exits with
+status 1 if any route lost more than --threshold percent throughput or
+gained more than that in p99 latency.
+"""
+import argparse
+import json
+import sys
+
+
+def index(report):
+    rows = {}
+    for run in report['runs']:
+        for result in run['results']:
+            rows[(run['dataset']['users'], run['config']['label'], result['route'])] = result
+    return rows
+
+
+def change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    old_rows, new_rows = index(baseline), index(candidate)
+
+    print(f"baseline {baseline.get('commit')} vs candidate {candidate.get('commit')}")
+    print(f"{'users':>8} {'config':<12} {'route':<16} {'rps old':>9} {'rps new':>9} {'rps %':>7} "
+          f"{'p99 old':>9} {'p99 new':>9} {'p99 %':>7}")
+    regressions = []
+    for key in sorted(old_rows.keys() & new_rows.keys()):
+        old, new = old_rows[key], new_rows[key]
+        rps = change(old['throughput_rps'], new['throughput_rps'])
+        p99 = change(old['p99_ms'], new['p99_ms'])
+        flag = ''
+        if (rps is not None and rps < -args.threshold) or (p99 is not None and p99 > args.threshold):
+            flag = '  <- regression'
+            regressions.append(key)
+        users, config, route = key
+        print(f"{users:>8} {config:<12} {route:<16} {str(old['throughput_rps']):>9} {str(new['throughput_rps']):>9} "
+              f"{'' if rps is None else f'{rps:+.1f}':>7} {str(old['p99_ms']):>9} {str(new['p99_ms']):>9} "
+              f"{'' if p99 is None else f'{p99:+.1f}':>7}{flag}")
+
+    missing = old_rows.keys() ^ new_rows.keys()
+    if missing:
+        print(f"\n{len(missing)} rows only present in one file were skipped")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Drive every API route under concurrent load and report latency percentiles.
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 [--requests 500] [--concurrency 16]
+
+The server must be running on a dataset written by benchmarks.seed with the
+same --users/--codes, and with RATE_LIMIT_ENABLED=0 so the limiter doesn't
+turn the run into a 429 benchmark. benchmarks.run does all of that for you.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+import requests
+
+from benchmarks.seed import PASSWORD, code, email, username
+
+ADDRESSES = ['123 Main St.', '456 elm street', '789 Oak Avenue', '12 Pine Rd', '1600 Amphitheatre Pkwy']
+
+
+def _register(i, ctx):
+    tag = f"{ctx['run']}x{i}"
+    return 'POST', '/api/register', {
+        "email": f"new{tag}@example.com",
+        "username": f"new{tag}",
+        "password": PASSWORD,
+        "first_name": "New",
+        "last_name": "User"
+    }
+
+
+def _login(i, ctx):
+    return 'POST', '/api/login', {"identifier": username(i % ctx['users']), "password": PASSWORD}
+
+
+def _send_code(i, ctx):
+    return 'POST', '/api/send-code', {"email": f"code{ctx['run']}x{i}@example.com"}
+
+
+def _verify_code(i, ctx):
+    i %= ctx['codes']
+    return 'POST', '/api/verify-code', {"email": email(i), "code": code(i)}
+
+
+def _check_username(i, ctx):
+    name = username(i % ctx['users']) if i % 2 else f"free{ctx['run']}x{i}"
+    return 'GET', f'/api/check-username/{name}', None
+
+
+def _property_value(i, ctx):
+    return 'GET', '/api/property-value', {"address": ADDRESSES[i % len(ADDRESSES)]}
+
+
+def _reset_password(i, ctx):
+    return 'POST', '/api/reset-password', {"email": email(i), "code": code(i), "new_password": PASSWORD}
+
+
+# Run order matters: reset-password consumes the seeded codes, so it goes
+# after verify-code, and it keeps PASSWORD so later logins still succeed.
+ROUTES = {
+    'check-username': _check_username,
+    'property-value': _property_value,
+    'login': _login,
+    'register': _register,
+    'send-code': _send_code,
+    'verify-code': _verify_code,
+    'reset-password': _reset_password,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_route(base_url, route, requests_count, concurrency, ctx):
+    make = ROUTES[route]
+    if route == 'reset-password':
+        requests_count = min(requests_count, ctx['codes'])
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests_count))
+    lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, path, body = make(i, ctx)
+            start = time.perf_counter()
+            try:
+                if method == 'GET':
+                    res = session.get(base_url + path, params=body, timeout=60)
+                else:
+                    res = session.post(base_url + path, json=body, timeout=60)
+                status = res.status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if not status.startswith('2'))
+    return {
+        "route": route,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1e3, 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1e3, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1e3, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1e3, 2) if latencies else None,
+    }
+
+
+def run_all(base_url, routes, requests_count, concurrency, users, codes):
+    ctx = {"users": users, "codes": codes, "run": uuid.uuid4().hex[:8]}
+    ordered = [route for route in ROUTES if route in routes]
+    return [run_route(base_url, route, requests_count, concurrency, ctx) for route in ordered]
+
+
+def print_table(results, title=''):
+    if title:
+        print(f"\n{title}")
+    print(f"{'route':<16} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['route']:<16} {r['requests']:>6} {r['errors']:>5} {str(r['throughput_rps']):>8} "
+              f"{str(r['p50_ms']):>8} {str(r['p95_ms']):>8} {str(r['p99_ms']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--codes', type=int, default=2_000)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = run_all(args.url.rstrip('/'), args.routes.split(','), args.requests,
+                      args.concurrency, args.users, args.codes)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Load-test the whole API across dataset sizes and gunicorn configurations.
+
+    python -m benchmarks.run [--users 1000,100000] [--configs sync:1,sync:2,gthread:2x4]
+                             [--requests 500] [--concurrency 16] [--brevo-latency 0.2]
+                             [--output results.json]
+
+For every (dataset size, config) pair this seeds a fresh dataset in a temp
+dir, starts a local Brevo stub and `gunicorn app:app` against it, drives every
+route through benchmarks.loadtest and shuts the server down. Configs are
+`<worker class>:<workers>[x<threads>]`. Results are written as JSON
+(by default to benchmarks/results/<commit>-<time>.json) for
+benchmarks.compare.
+Everything runs on localhost; no network access is needed.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.brevo_stub import BrevoStub
+from benchmarks.loadtest import ROUTES, print_table, run_all
+from benchmarks.seed import seed
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_config(text):
+    worker_class, _, size = text.partition(':')
+    workers, _, threads = (size or '1').partition('x')
+    return {"label": text, "worker_class": worker_class, "workers": int(workers), "threads": int(threads or 1)}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(config, data_dir, stub_url, args):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO + os.pathsep + os.environ.get('PYTHONPATH', ''),
+        BREVO_API_URL=stub_url,
+        BREVO_API_KEY='bench',
+        FLASK_SECRET_KEY='bench',
+        RATE_LIMIT_ENABLED='0',
+        LOG_LEVEL='WARNING',
+        SCRYPT_N=str(args.scrypt_n),
+        HASH_WORKERS=str(args.hash_workers),
+        CODES_BACKEND=args.codes_backend,
+    )
+    cmd = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+           '--worker-class', config['worker_class'], '--workers', str(config['workers']),
+           '--threads', str(config['threads']), '--timeout', '120', '--log-level', 'warning']
+    log = open(os.path.join(data_dir, 'gunicorn.log'), 'w')
+    proc = subprocess.Popen(cmd, cwd=data_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            if requests.get(url + '/api/health', timeout=1).status_code == 200:
+                return proc, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    with open(log.name) as f:
+        raise RuntimeError(f"gunicorn failed to start ({config['label']}):\n{f.read()[-2000:]}")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', default='1000,100000', help="comma-separated dataset sizes")
+    parser.add_argument('--codes', type=int, default=2000)
+    parser.add_argument('--configs', default='sync:1,sync:2,gthread:2x4')
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--brevo-latency', type=float, default=0.2)
+    parser.add_argument('--scrypt-n', type=int, default=2 ** 14)
+    parser.add_argument('--hash-workers', type=int, default=2)
+    parser.add_argument('--codes-backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--startup-timeout', type=float, default=120)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": vars(args),
+        "runs": []
+    }
+
+    stub = BrevoStub(latency=args.brevo_latency).start()
+    try:
+        for users in (int(n) for n in args.users.split(',')):
+            for config in (parse_config(c) for c in args.configs.split(',')):
+                with tempfile.TemporaryDirectory(prefix='turbinix-bench-') as data_dir:
+                    dataset = seed(data_dir, users, args.codes, args.scrypt_n, args.codes_backend)
+                    proc, url = start_server(config, data_dir, stub.url, args)
+                    try:
+                        results = run_all(url, args.routes.split(','), args.requests,
+                                          args.concurrency, users, dataset['codes'])
+                    finally:
+                        stop_server(proc)
+                print_table(results, f"users={users} config={config['label']}")
+                report["runs"].append({"dataset": dataset, "config": config, "results": results})
+    finally:
+        stub.shutdown()
+
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join(REPO, 'benchmarks', 'results'), exist_ok=True)
+        output = os.path.join(REPO, 'benchmarks', 'results',
+                              f"{commit or 'nocommit'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
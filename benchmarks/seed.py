@@ -0,0 +1,79 @@
+"""Write synthetic users.json / codes.json datasets for load tests.
+
+    python -m benchmarks.seed DATA_DIR [--users 10000] [--codes 2000]
+
+User i is `benchuser{i}` / `benchuser{i}@example.com` with password
+`PASSWORD`, and code i belongs to user i. Codes are backdated past the resend
+cooldown but are still valid, so verify-code and reset-password accept them.
+"""
+import argparse
+import json
+import os
+import time
+
+from code_store import RESEND_COOLDOWN, SQLiteCodeStore
+from passwords import PasswordHasher
+
+PASSWORD = 'bench-password'
+
+
+def username(i):
+    return f'benchuser{i}'
+
+
+def email(i):
+    return f'benchuser{i}@example.com'
+
+
+def code(i):
+    return f'{i * 7919 % 1_000_000:06d}'
+
+
+def seed(data_dir, users=10_000, codes=2_000, scrypt_n=2 ** 14, codes_backend='json'):
+    os.makedirs(data_dir, exist_ok=True)
+    for name in os.listdir(data_dir):
+        if name.startswith(('users.json', 'codes.json', 'codes.db', 'ratelimit.db')):
+            os.remove(os.path.join(data_dir, name))
+
+    # Every user shares one hash: hashing a million passwords would take hours
+    # and the server can't tell the difference.
+    password = PasswordHasher(n=scrypt_n, workers=0).hash(PASSWORD)
+    with open(os.path.join(data_dir, 'users.json'), 'w') as f:
+        json.dump([{
+            'username': username(i),
+            'email': email(i),
+            'password': password,
+            'first_name': 'Bench',
+            'last_name': f'User{i}'
+        } for i in range(users)], f)
+
+    timestamp = time.time() - RESEND_COOLDOWN - 1
+    records = [{"email": email(i), "code": code(i), "timestamp": timestamp} for i in range(min(codes, users))]
+    with open(os.path.join(data_dir, 'codes.json'), 'w') as f:
+        json.dump(records, f)
+    if codes_backend == 'sqlite':
+        store = SQLiteCodeStore(os.path.join(data_dir, 'codes.db'))
+        for record in records:
+            store.issue(record['email'], record['code'], record['timestamp'])
+
+    return {
+        "users": users,
+        "codes": len(records),
+        "users_bytes": os.path.getsize(os.path.join(data_dir, 'users.json')),
+        "codes_bytes": os.path.getsize(os.path.join(data_dir, 'codes.json'))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('data_dir')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--codes', type=int, default=2_000)
+    parser.add_argument('--scrypt-n', type=int, default=2 ** 14)
+    parser.add_argument('--codes-backend', choices=['json', 'sqlite'], default='json')
+    args = parser.parse_args()
+    print(seed(args.data_dir, args.users, args.codes, args.scrypt_n, args.codes_backend))
+
+
+if __name__ == '__main__':
+    main()
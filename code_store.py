@@ -0,0 +1,211 @@
+import heapq
+import threading
+import time
+
+from db import LocalConnection
+from user_store import normalize_email
+
+CODE_TTL = 600
+RESEND_COOLDOWN = 60
+MAX_CODES = 100_000
+
+VALID = 'valid'
+EXPIRED = 'expired'
+INVALID = 'invalid'
+
+
+class CodeStore:
+    """Verification codes keyed by email, expired through a min-heap.
+
+    The heap holds (expires_at, email, timestamp) and is cleaned lazily: an
+    entry whose timestamp no longer matches the live record was superseded
+    by a resend and is skipped. When more than `max_entries` codes are live
+    the ones closest to expiry are evicted first. Reads hold the journal's
+    lock (or a private one without a journal) and writes run inside
+    `journal.writing()`, so request threads never see the records and the
+    heap out of step, and codes issued by other workers are seen first.
+    Emails are keyed by `normalize_email`, the same as in UserStore.
+    """
+
+    def __init__(self, records=None, journal=None, ttl=CODE_TTL,
+                 cooldown=RESEND_COOLDOWN, max_entries=MAX_CODES):
+        self.ttl = ttl
+        self.cooldown = cooldown
+        self.max_entries = max_entries
+        self.journal = None
+        self._lock = journal.lock if journal is not None else threading.RLock()
+        self._reset(records or [])
+        # Drop expired codes before attaching the journal: they are gone from
+        # the next snapshot anyway, and startup then never writes the journal.
+        self.purge(time.time())
+        self.journal = journal
+        if journal is not None:
+            journal.source = lambda: list(self.records.values())
+            journal.on_entry = self._replay
+            journal.on_reload = self._reset
+
+    def __len__(self):
+        return len(self.records)
+
+    def _reset(self, records):
+        self.records = {}
+        self.heap = []
+        for record in records:
+            self._insert(record)
+
+    def _replay(self, entry):
+        if entry['op'] == 'put':
+            self._insert(entry['value'])
+        elif entry['op'] == 'delete':
+            self.records.pop(entry['key'], None)
+
+    def _writing(self):
+        return self.journal.writing() if self.journal is not None else self._lock
+
+    def _refresh(self):
+        if self.journal is not None:
+            self.journal.refresh()
+
+    def _insert(self, record):
+        self.records[record['email']] = record
+        heapq.heappush(self.heap, (record['timestamp'] + self.ttl, record['email'], record['timestamp']))
+
+    def _remove(self, email):
+        if email not in self.records:
+            return
+        if self.journal is not None:
+            self.journal.delete(email)
+        del self.records[email]
+
+    def purge(self, now):
+        with self._writing():
+            self._purge(now)
+
+    def _purge(self, now):
+        while self.heap and (self.heap[0][0] <= now or len(self.records) > self.max_entries):
+            _, email, timestamp = heapq.heappop(self.heap)
+            record = self.records.get(email)
+            if record is not None and record['timestamp'] == timestamp:
+                self._remove(email)
+        # Superseded heap entries only leave via heappop; rebuild if they pile up.
+        if len(self.heap) > 2 * len(self.records) + 64:
+            self.heap = [(r['timestamp'] + self.ttl, r['email'], r['timestamp']) for r in self.records.values()]
+            heapq.heapify(self.heap)
+
+    def cooldown_remaining(self, email, now):
+        email = normalize_email(email)
+        self._refresh()
+        with self._lock:
+            record = self.records.get(email)
+        if record is None:
+            return 0
+        return max(0, self.cooldown - (now - record['timestamp']))
+
+    def issue(self, email, code, now):
+        """Store a new code, or return None while the last one is in its
+        resend cooldown. The check and the write are one step, across
+        threads and worker processes."""
+        record = {"email": normalize_email(email), "code": code, "timestamp": now}
+        with self._writing():
+            current = self.records.get(record['email'])
+            if current is not None and now - current['timestamp'] < self.cooldown:
+                return None
+            if self.journal is not None:
+                self.journal.put(record)
+            self._insert(record)
+            self._purge(now)
+        return record
+
+    def check(self, email, code, now):
+        email = normalize_email(email)
+        self._refresh()
+        with self._lock:
+            record = self.records.get(email)
+        if record is None or record['code'] != code:
+            return INVALID
+        if now - record['timestamp'] <= self.ttl:
+            return VALID
+        with self._writing():
+            if self.records.get(email) is record:
+                self._remove(email)
+        return EXPIRED
+
+    def consume(self, email):
+        with self._writing():
+            self._remove(normalize_email(email))
+
+
+class SQLiteCodeStore:
+    """CodeStore backed by a SQLite database in WAL mode.
+
+    Lets every gunicorn worker see the same codes. Connections are opened
+    lazily per thread and per process, so the store is safe to create before
+    the server forks. Emails are keyed by `normalize_email`.
+    """
+
+    def __init__(self, path, ttl=CODE_TTL, cooldown=RESEND_COOLDOWN,
+                 max_entries=MAX_CODES, purge_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.cooldown = cooldown
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self.issued = 0
+        self._conn = LocalConnection(path)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS codes ("
+                "email TEXT PRIMARY KEY, code TEXT NOT NULL, timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS codes_timestamp ON codes (timestamp)")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+
+    def _get(self, email):
+        return self._conn().execute(
+            "SELECT code, timestamp FROM codes WHERE email = ?", (normalize_email(email),)
+        ).fetchone()
+
+    def purge(self, now):
+        conn = self._conn()
+        conn.execute("DELETE FROM codes WHERE timestamp <= ?", (now - self.ttl,))
+        conn.execute(
+            "DELETE FROM codes WHERE email IN ("
+            "SELECT email FROM codes ORDER BY timestamp "
+            "LIMIT max(0, (SELECT COUNT(*) FROM codes) - ?))",
+            (self.max_entries,),
+        )
+
+    def cooldown_remaining(self, email, now):
+        row = self._get(email)
+        if row is None:
+            return 0
+        return max(0, self.cooldown - (now - row[1]))
+
+    def issue(self, email, code, now):
+        email = normalize_email(email)
+        cursor = self._conn().execute(
+            "INSERT INTO codes (email, code, timestamp) VALUES (?, ?, ?) "
+            "ON CONFLICT (email) DO UPDATE SET code = excluded.code, timestamp = excluded.timestamp "
+            "WHERE codes.timestamp <= ?",
+            (email, code, now, now - self.cooldown),
+        )
+        if cursor.rowcount == 0:
+            return None
+        self.issued += 1
+        if self.issued % self.purge_every == 0:
+            self.purge(now)
+        return {"email": email, "code": code, "timestamp": now}
+
+    def check(self, email, code, now):
+        row = self._get(email)
+        if row is None or row[0] != code:
+            return INVALID
+        if now - row[1] > self.ttl:
+            self.consume(email)
+            return EXPIRED
+        return VALID
+
+    def consume(self, email):
+        self._conn().execute("DELETE FROM codes WHERE email = ?", (normalize_email(email),))
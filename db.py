@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection:
+    """Opens `path` as a WAL-mode SQLite database, one connection per thread.
+
+    Call it to get this thread's connection. Connections are opened lazily
+    and reopened after a fork, so an owner created before gunicorn forks
+    never shares a connection between workers. They run in autocommit mode;
+    use an explicit BEGIN for transactions.
+    """
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def __call__(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            local.conn.execute("PRAGMA journal_mode=WAL")
+            local.conn.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.conn
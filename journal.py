@@ -0,0 +1,368 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from metrics import span
+
+log = logging.getLogger('turbinix.journal')
+
+SNAPSHOT_CHUNK = 1000
+
+
+class Journal:
+    """Snapshot + append-only journal persistence for a keyed list of records.
+
+    The snapshot (`path`) is a JSON list, the same format the app has always
+    written. Every mutation is appended as one JSON line to `path + '.journal'`.
+    Each journal file is a segment that starts with a `{"op": "segment",
+    "seq": N}` header line.
+
+    Any number of processes may share the files. A writer takes an exclusive
+    flock on `path + '.lock'` (without holding `lock`, so readers in its
+    process carry on), replays whatever other processes appended since it
+    last looked, and only then runs the store's check-then-write under
+    `lock`. Readers call `refresh`, which costs one stat when nothing
+    changed. Records written by other processes reach the store through the
+    `on_entry` hook, and a full reload through `on_reload`.
+
+    Once the journal outgrows `compact_ratio` times the snapshot (and at
+    least `compact_min_bytes`), the writer rotates it: the segment is linked
+    to `path + '.journal.old'` and a fresh one takes its place. A background
+    thread then writes the store's records to the snapshot and unlinks the
+    old segment, so request threads never wait for it. That snapshot may
+    include writes made after the rotation, which is harmless: each record
+    carries a whole value, and every write after the rotation is replayed
+    from the new segment on top of the snapshot. For the same reason
+    re-applying a segment after a crash mid-compaction is harmless. The
+    compacting thread holds a flock on the old segment, so if its process
+    dies the next writer finishes the job.
+    """
+
+    def __init__(self, path, key, compact_ratio=1.0, compact_min_bytes=1 << 20, fsync=False):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.old_path = path + '.journal.old'
+        self.lock_path = path + '.lock'
+        self.key = key
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self.fsync = fsync
+        self.source = None
+        self.on_entry = None
+        self.on_reload = None
+        self.lock = threading.RLock()
+        self._writer = threading.RLock()
+        self._depth = 0
+        self._lock_fh = None
+        self._lock_pid = None
+        self._fd = None
+        self._ino = None
+        self._seq = 0
+        self._offset = 0
+        self._seen = None
+        self._rotate_due = False
+        self._compactor = None
+
+    def load(self):
+        with self.lock:
+            return self._load()
+
+    def _load(self):
+        # Pin both segments before reading the snapshot: whatever compaction
+        # finishes meanwhile, the snapshot is then no older than the segments.
+        self._close()
+        fd = self._open(self.journal_path)
+        old_fd = self._open(self.old_path)
+        try:
+            records = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    try:
+                        snapshot = json.load(f)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Corrupt snapshot {self.path}: {e}") from e
+                for record in snapshot:
+                    records[record[self.key]] = record
+
+            def apply(entry):
+                self._apply(records, entry)
+
+            if old_fd is not None and not (fd is not None and os.path.sameopenfile(old_fd, fd)):
+                self._read(old_fd, self._header(old_fd)[1], apply)
+            if fd is not None:
+                self._seq, offset = self._header(fd)
+                self._fd, self._ino = fd, os.fstat(fd).st_ino
+                self._offset = self._read(fd, offset, apply)
+                self._seen = (self._ino, self._offset)
+            else:
+                self._seq, self._offset, self._seen = 0, 0, None
+        except BaseException:
+            if fd is not None and fd != self._fd:
+                os.close(fd)
+            raise
+        finally:
+            if old_fd is not None:
+                os.close(old_fd)
+        return list(records.values())
+
+    def _open(self, path):
+        try:
+            return os.open(path, os.O_RDWR | os.O_APPEND)
+        except FileNotFoundError:
+            return None
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = self._ino = None
+
+    def _header(self, fd):
+        """Return (seq, offset of the first record) for a segment.
+
+        Journals written before segments existed have no header and count as
+        segment 0.
+        """
+        first = os.pread(fd, 4096, 0).split(b'\n', 1)[0]
+        try:
+            header = json.loads(first)
+        except ValueError:
+            return 0, 0
+        if isinstance(header, dict) and header.get('op') == 'segment':
+            return header['seq'], len(first) + 1
+        return 0, 0
+
+    def _read(self, fd, offset, apply):
+        """Apply every complete record after `offset`; return the new offset.
+
+        Stops before a line that is unterminated or not valid JSON: either
+        another process is halfway through writing it, or it is a torn tail
+        that the next writer truncates.
+        """
+        size = os.fstat(fd).st_size
+        if size <= offset:
+            return offset
+        data = os.pread(fd, size - offset, offset)
+        pos = 0
+        while True:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                break
+            try:
+                entry = json.loads(data[pos:end])
+            except ValueError:
+                break
+            apply(entry)
+            pos = end + 1
+        return offset + pos
+
+    def _apply(self, records, entry):
+        if entry['op'] == 'put':
+            value = entry['value']
+            records[value[self.key]] = value
+        elif entry['op'] == 'delete':
+            records.pop(entry['key'], None)
+
+    def refresh(self):
+        """Apply records that other processes appended since the last call."""
+        try:
+            st = os.stat(self.journal_path)
+            seen = (st.st_ino, st.st_size)
+        except FileNotFoundError:
+            seen = None
+        if seen != self._seen:
+            with self.lock:
+                self._catch_up()
+
+    def _catch_up(self):
+        apply = self.on_entry or (lambda entry: None)
+        while True:
+            try:
+                st = os.stat(self.journal_path)
+            except FileNotFoundError:
+                st = None
+            if self._fd is None:
+                if st is not None:
+                    self._reload()
+                return
+            self._offset = self._read(self._fd, self._offset, apply)
+            if st is not None and st.st_ino == self._ino:
+                self._seen = (st.st_ino, st.st_size)
+                return
+            # Our segment was rotated out under the flock, so nothing more
+            # will be appended to it and it has now been read in full.
+            fd = self._open(self.journal_path)
+            seq, offset = self._header(fd) if fd is not None else (None, 0)
+            if seq != self._seq + 1:
+                # Missed a whole segment, which compaction has since folded
+                # into the snapshot.
+                if fd is not None:
+                    os.close(fd)
+                self._reload()
+                return
+            self._close()
+            self._fd, self._ino, self._seq, self._offset = fd, os.fstat(fd).st_ino, seq, offset
+
+    def _reload(self):
+        records = self._load()
+        if self.on_reload is not None:
+            self.on_reload(records)
+
+    @contextmanager
+    def writing(self):
+        """Hold the file for writing, across threads and processes.
+
+        Inside the block the store is caught up with every other writer and
+        `lock` is held, so a check followed by `put` is atomic. Nests.
+        """
+        with self._writer:
+            self._depth += 1
+            try:
+                if self._depth == 1:
+                    self._acquire_file_lock()
+                with self.lock:
+                    if self._depth == 1:
+                        self._catch_up()
+                        self._trim()
+                    yield
+                    # Rotate only once the store has applied its write, so
+                    # the snapshot taken of it includes every rotated record.
+                    if self._depth == 1 and self._rotate_due:
+                        self._rotate_due = False
+                        self._rotate()
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._lock_fh is not None:
+                    fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+
+    def _acquire_file_lock(self):
+        # A forked worker shares its parent's open file, and with it the flock.
+        if self._lock_pid != os.getpid():
+            self._lock_fh = open(self.lock_path, 'a')
+            self._lock_pid = os.getpid()
+        with span('journal_lock_wait'):
+            fcntl.flock(self._lock_fh, fcntl.LOCK_EX)
+
+    def _trim(self):
+        # Only a crashed writer leaves an unterminated line; drop it so the
+        # next record starts on a clean line.
+        if self._fd is not None and os.fstat(self._fd).st_size > self._offset:
+            os.ftruncate(self._fd, self._offset)
+
+    def _append(self, entry):
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode()
+        with self.writing():
+            if self._fd is None:
+                self._start_segment(self._seq + 1)
+            with span('journal_append'):
+                written = os.write(self._fd, line)
+                if written != len(line):
+                    os.ftruncate(self._fd, self._offset)
+                    raise OSError(f"short write to {self.journal_path}")
+                if self.fsync:
+                    os.fsync(self._fd)
+            self._offset += len(line)
+            self._seen = (self._ino, self._offset)
+            if self.source is not None and self._offset > self._compact_threshold():
+                self._rotate_due = True
+
+    def put(self, record):
+        self._append({'op': 'put', 'value': record})
+
+    def delete(self, key):
+        self._append({'op': 'delete', 'key': key})
+
+    def _compact_threshold(self):
+        try:
+            snapshot = os.path.getsize(self.path)
+        except FileNotFoundError:
+            snapshot = 0
+        return max(self.compact_min_bytes, self.compact_ratio * snapshot)
+
+    def _start_segment(self, seq):
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({'op': 'segment', 'seq': seq}, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, self.journal_path)
+        fd = os.open(self.journal_path, os.O_RDWR | os.O_APPEND)
+        self._close()
+        self._fd, self._ino, self._seq = fd, os.fstat(fd).st_ino, seq
+        self._offset = os.fstat(fd).st_size
+        self._seen = (self._ino, self._offset)
+
+    def _rotate(self):
+        old_fd = self._open(self.old_path)
+        if old_fd is None:
+            os.link(self.journal_path, self.old_path)
+            old_fd = os.open(self.old_path, os.O_RDONLY)
+            fcntl.flock(old_fd, fcntl.LOCK_EX)
+            self._start_segment(self._seq + 1)
+        else:
+            try:
+                fcntl.flock(old_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                stale = os.path.samestat(os.stat(self.old_path), os.fstat(old_fd))
+            except (BlockingIOError, FileNotFoundError):
+                stale = False
+            if not stale:
+                # Still being compacted, or finished since it was opened.
+                os.close(old_fd)
+                return
+            # Whoever rotated it died before finishing; this store has
+            # replayed it, so compact it from here without rotating again.
+        records = list(self.source())
+        self._compactor = threading.Thread(
+            target=self._compact_in_background, args=(records, old_fd),
+            name=f'compact-{os.path.basename(self.path)}', daemon=True)
+        self._compactor.start()
+
+    def _compact_in_background(self, records, old_fd):
+        try:
+            with span('journal_compact'):
+                self._write_snapshot(records)
+            self._unlink_old(old_fd)
+        except Exception:
+            # The old segment stays and the next writer retries.
+            log.exception("journal compaction failed", extra={"path": self.path})
+        finally:
+            os.close(old_fd)
+
+    def _unlink_old(self, old_fd):
+        try:
+            if os.path.samestat(os.stat(self.old_path), os.fstat(old_fd)):
+                os.unlink(self.old_path)
+        except FileNotFoundError:
+            pass
+
+    def _write_snapshot(self, records):
+        # Encoding a chunk at a time keeps each C call short, so request
+        # threads get the GIL back while a large snapshot is written.
+        records = list(records)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('[')
+            for i in range(0, len(records), SNAPSHOT_CHUNK):
+                chunk = json.dumps(records[i:i + SNAPSHOT_CHUNK], separators=(',', ':'))
+                f.write((',' if i else '') + chunk[1:-1])
+            f.write(']')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def compact(self, records=None):
+        """Write `records` (default: the store's) as the snapshot right now
+        and start an empty journal. Waits for a running compaction."""
+        with self.writing():
+            old_fd = self._open(self.old_path)
+            try:
+                if old_fd is not None:
+                    fcntl.flock(old_fd, fcntl.LOCK_EX)
+                with span('journal_compact'):
+                    self._write_snapshot(self.source() if records is None else records)
+                self._start_segment(self._seq + 1)
+                if old_fd is not None:
+                    self._unlink_old(old_fd)
+            finally:
+                if old_fd is not None:
+                    os.close(old_fd)
@@ -0,0 +1,206 @@
+import bisect
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{n}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ('le',)
+        with self._lock:
+            series = sorted((labels, (list(c), t, n)) for labels, (c, t, n) in self.series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ('+Inf',), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Value read from `fn` at scrape time."""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", f"{self.name} {self.fn()}"]
+
+
+class CounterFunc(Gauge):
+    """Running total read from `fn` at scrape time; `fn` must never decrease."""
+
+    type = 'counter'
+
+
+class Registry:
+    """Process-local metrics, rendered in the Prometheus text format.
+
+    Under gunicorn every worker keeps its own registry, so each scrape sees
+    the worker that served it.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.spans = self.histogram(
+            'turbinix_span_seconds', 'Time spent in instrumented operations.', ['span'])
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.add(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn):
+        return self.add(Gauge(name, help, fn))
+
+    def counter_func(self, name, help, fn):
+        return self.add(CounterFunc(name, help, fn))
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.observe(time.perf_counter() - start, name)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+span = REGISTRY.span
+
+
+class RequestMetrics:
+    """Per-route latency and request/error counts for a Flask app, plus an
+    opt-in profiler.
+
+    With `profile_rate > 0` that fraction of requests runs under cProfile,
+    and any profiled request slower than `profile_slow_ms` is dumped to
+    `profile_dir` as a .prof file (open with snakeviz, or convert with
+    flameprof for a flamegraph).
+    """
+
+    def __init__(self, registry=REGISTRY, profile_rate=0.0, profile_slow_ms=500, profile_dir='profiles'):
+        self.registry = registry
+        self.latency = registry.histogram(
+            'turbinix_http_request_duration_seconds', 'Request latency by route.', ['method', 'route'])
+        self.requests = registry.counter(
+            'turbinix_http_requests_total', 'Requests by route and status.', ['method', 'route', 'status'])
+        self.errors = registry.counter(
+            'turbinix_http_errors_total', 'Responses with status >= 500 by route.', ['method', 'route'])
+        self.profile_rate = profile_rate
+        self.profile_slow_ms = profile_slow_ms
+        self.profile_dir = profile_dir
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.add_url_rule('/api/metrics', 'metrics', self.endpoint, methods=['GET'])
+
+    def _before(self):
+        g.metrics_start = time.perf_counter()
+        if self.profile_rate and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process; another
+                # request thread is already being sampled, so skip this one.
+                return
+            g.profiler = profiler
+
+    def _after(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.latency.observe(elapsed, request.method, route)
+        self.requests.inc(request.method, route, response.status_code)
+        if response.status_code >= 500:
+            self.errors.inc(request.method, route)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= self.profile_slow_ms:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                name = f"{int(time.time() * 1000)}-{request.method}-{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_')}.prof"
+                profiler.dump_stats(os.path.join(self.profile_dir, name))
+        return response
+
+    def endpoint(self):
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
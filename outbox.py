@@ -0,0 +1,188 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import span
+
+BREVO_URL = "https://api.brevo.com/v3/smtp/email"
+SENDER = {"name": "Turbinix", "email": "no-reply@turbinix.one"}
+
+log = logging.getLogger('turbinix.outbox')
+
+
+class Outbox:
+    """Queue of outgoing emails drained by background sender threads.
+
+    Routes call `enqueue` and return straight away. `workers` threads share
+    one keep-alive `requests.Session`, so concurrency towards Brevo is bounded
+    and TLS connections are reused. Failed sends are retried with exponential
+    backoff; 5xx, 429 and network errors are retried, other 4xx are not.
+    Messages that still fail are appended to `dead_letter_path`.
+
+    With `batch_size > 1` a worker sends up to that many queued messages in
+    one request using Brevo's `messageVersions`.
+
+    The sender threads are daemons, so an exit hook gives the queue up to
+    `shutdown_timeout` seconds to drain and dead-letters whatever is left.
+    """
+
+    def __init__(self, url, api_key, workers=4, max_queue=10_000, batch_size=1,
+                 max_retries=4, backoff=0.5, timeout=10, dead_letter_path='dead_letters.jsonl',
+                 shutdown_timeout=10):
+        self.url = url
+        self.api_key = api_key
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.dead_letter_path = dead_letter_path
+        self.shutdown_timeout = shutdown_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _start(self):
+        # Threads don't survive fork, so each gunicorn worker starts its own.
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.session.headers.update({
+                "accept": "application/json",
+                "api-key": self.api_key,
+                "content-type": "application/json"
+            })
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f'outbox-{i}', daemon=True).start()
+            atexit.register(self.close)
+            self._pid = os.getpid()
+
+    def enqueue(self, email, subject, html_content):
+        if not self.api_key:
+            log.error("missing Brevo API key")
+            return False
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait({"email": email, "subject": subject, "htmlContent": html_content})
+        except queue.Full:
+            log.error("outbox full, dropping message", extra={"email": email})
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued message is handled; False on timeout."""
+        if timeout is None:
+            self.queue.join()
+            return True
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Drain the queue before exit and dead-letter what doesn't make it."""
+        # Forked children inherit the parent's exit hook; only the process
+        # that owns the sender threads has anything to drain.
+        if self._pid != os.getpid():
+            return
+        if self.flush(self.shutdown_timeout if timeout is None else timeout):
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            self.queue.task_done()
+        if batch:
+            self._dead_letter(batch, "shutdown")
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._deliver(batch)
+            except Exception:
+                log.exception("outbox delivery error")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _payload(self, batch):
+        if len(batch) == 1:
+            message = batch[0]
+            return {
+                "sender": SENDER,
+                "to": [{"email": message['email']}],
+                "subject": message['subject'],
+                "htmlContent": message['htmlContent']
+            }
+        return {
+            "sender": SENDER,
+            "subject": batch[0]['subject'],
+            "htmlContent": batch[0]['htmlContent'],
+            "messageVersions": [{
+                "to": [{"email": m['email']}],
+                "subject": m['subject'],
+                "htmlContent": m['htmlContent']
+            } for m in batch]
+        }
+
+    def _deliver(self, batch):
+        payload = self._payload(batch)
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1) * (1 + random.random()))
+            try:
+                with span('email_send'):
+                    res = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                error = str(e)
+                continue
+            log.info("email send attempt", extra={
+                "emails": [m['email'] for m in batch],
+                "status": res.status_code,
+                "attempt": attempt + 1
+            })
+            if res.status_code < 400:
+                with self._lock:
+                    self.sent += len(batch)
+                return True
+            error = f"HTTP {res.status_code}: {res.text[:200]}"
+            if res.status_code < 500 and res.status_code != 429:
+                break
+        self._dead_letter(batch, error)
+        return False
+
+    def _dead_letter(self, batch, error):
+        with self._lock:
+            self.failed += len(batch)
+            with open(self.dead_letter_path, 'a') as f:
+                for message in batch:
+                    f.write(json.dumps({"failed_at": time.time(), "error": error, **message}) + '\n')
+        log.error("email dead-lettered", extra={"emails": [m['email'] for m in batch], "error": error})
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import span
+
+log = logging.getLogger('turbinix.passwords')
+
+SCHEME = 'scrypt'
+VERSION = 'v1'
+
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def scrypt(password, salt, n, r, p):
+    maxmem = 128 * r * (n + p + 2) + 2 ** 20
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=32)
+
+
+def is_legacy(stored):
+    return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+
+class PasswordHasher:
+    """Salted scrypt hashing run in a bounded process pool.
+
+    Hashes are stored as `scrypt$v1$n=..,r=..,p=..$<salt>$<hash>` so cost
+    parameters can be raised later; `verify` reports when a stored hash
+    should be replaced, either because it is a legacy unsalted SHA-256 hex
+    digest or because it was made with different parameters.
+
+    `workers=0` hashes on the calling thread. The pool uses the forkserver
+    start method (spawn where that is unavailable): forking a threaded
+    gunicorn worker can copy a lock that another thread holds. The
+    forkserver preloads only this module, but multiprocessing still
+    re-imports the `__main__` script in every child, so a script that sets
+    the app up at import time (app.py run as `python app.py`) must hash
+    inline.
+
+    Unknown users and legacy hashes are also run through scrypt, against a
+    dummy hash, so response time doesn't reveal which accounts exist.
+    """
+
+    def __init__(self, n=2 ** 14, r=8, p=1, workers=2):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+        self._dummy = None
+        self._lock = threading.Lock()
+
+    def _run(self, password, salt, n, r, p):
+        with span('password_hash'):
+            return self._hash(password, salt, n, r, p)
+
+    def _hash(self, password, salt, n, r, p):
+        if not self.workers:
+            return scrypt(password, salt, n, r, p)
+        pool = self._get_pool()
+        try:
+            return pool.submit(scrypt, password, salt, n, r, p).result()
+        except BrokenProcessPool:
+            # A child died (an OOM kill, most likely) and took the pool with
+            # it; start a new one and retry once.
+            return self._get_pool(broken=pool).submit(scrypt, password, salt, n, r, p).result()
+
+    def _get_pool(self, broken=None):
+        if self._pid == os.getpid() and self._pool is not broken:
+            return self._pool
+        with self._lock:
+            if self._pid != os.getpid() or self._pool is broken:
+                if broken is not None:
+                    log.warning("password hashing pool broken, restarting it")
+                    broken.shutdown(wait=False)
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                ctx = multiprocessing.get_context(method)
+                if method == 'forkserver':
+                    ctx.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _params(self):
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    @property
+    def dummy_hash(self):
+        if self._dummy is None:
+            self._dummy = self.hash(_b64(os.urandom(16)))
+        return self._dummy
+
+    def hash(self, password):
+        salt = os.urandom(16)
+        digest = self._run(password, salt, self.n, self.r, self.p)
+        return f"{SCHEME}${VERSION}${self._params()}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password, stored):
+        """Return (matches, needs_rehash). `stored` is None for unknown users."""
+        if not stored:
+            self.verify(password, self.dummy_hash)
+            return False, False
+        if is_legacy(stored):
+            self.verify(password, self.dummy_hash)
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored), True
+
+        try:
+            scheme, version, params, salt, digest = stored.split('$')
+            values = dict(item.split('=') for item in params.split(','))
+            n, r, p = int(values['n']), int(values['r']), int(values['p'])
+        except (ValueError, KeyError):
+            return False, False
+        if scheme != SCHEME or version != VERSION:
+            return False, False
+
+        computed = self._run(password, _unb64(salt), n, r, p)
+        matches = hmac.compare_digest(computed, _unb64(digest))
+        return matches, matches and params != self._params()
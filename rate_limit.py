@@ -0,0 +1,133 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+from db import LocalConnection
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """Parse "10/minute" into (burst, tokens per second)."""
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period.strip()]
+
+
+class MemoryBuckets:
+    """Token buckets for one process, evicting the least recently used."""
+
+    def __init__(self, max_buckets=100_000):
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key, burst, rate, now):
+        """Take one token; return 0 if allowed, else seconds until one is available."""
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                self.buckets.move_to_end(key)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self.buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBuckets:
+    """Token buckets in a WAL-mode SQLite file shared by all gunicorn workers."""
+
+    def __init__(self, path, max_idle=3600, sweep_every=1000):
+        self.path = path
+        self.max_idle = max_idle
+        self.sweep_every = sweep_every
+        self.takes = 0
+        self._conn = LocalConnection(path)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+    def take(self, key, burst, rate, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - 1 if wait == 0 else tokens, now),
+            )
+            self.takes += 1
+            if self.takes % self.sweep_every == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.max_idle,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+class RateLimiter:
+    """Per-route token bucket limits, applied with the `limit` decorator.
+
+    Each route can limit by client IP and by an identifier read from the
+    JSON body (email, username, ...). Buckets are keyed by route name, so
+    limits on one route never consume another route's allowance.
+    """
+
+    def __init__(self, store=None, enabled=True):
+        self.store = store if store is not None else MemoryBuckets()
+        self.enabled = enabled
+
+    def check(self, key, rate, now=None):
+        burst, per_second = parse_rate(rate) if isinstance(rate, str) else rate
+        return self.store.take(key, burst, per_second, time.time() if now is None else now)
+
+    def limit(self, ip=None, identifier=None, field=None):
+        """Limit a route to `ip` requests per client IP and `identifier`
+        requests per value of the JSON body's `field`, e.g. "5/minute"."""
+        def decorator(view):
+            name = view.__name__
+            ip_rate = parse_rate(ip) if ip else None
+            identifier_rate = parse_rate(identifier) if identifier else None
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                now = time.time()
+                wait = 0
+                if ip_rate:
+                    wait = self.check(f"{name}:ip:{request.remote_addr}", ip_rate, now)
+                if identifier_rate and not wait:
+                    data = request.get_json(silent=True)
+                    value = data.get(field) if isinstance(data, dict) else None
+                    if isinstance(value, str) and value:
+                        wait = self.check(f"{name}:id:{value.strip().casefold()}", identifier_rate, now)
+                if wait:
+                    response = jsonify({"error": "Too many requests. Please try again later."})
+                    response.headers['Retry-After'] = str(math.ceil(wait))
+                    return response, 429
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
@@ -0,0 +1,83 @@
+import pytest
+
+from code_store import EXPIRED, INVALID, VALID, CodeStore, SQLiteCodeStore
+from journal import Journal
+
+
+@pytest.fixture(params=['memory', 'journal', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'sqlite':
+            return SQLiteCodeStore(str(tmp_path / 'codes.db'), purge_every=1, **kwargs)
+        if request.param == 'journal':
+            journal = Journal(str(tmp_path / 'codes.json'), key='email')
+            return CodeStore(journal.load(), journal=journal, **kwargs)
+        return CodeStore(**kwargs)
+    return make
+
+
+def test_resend_waits_for_cooldown(make_store):
+    codes = make_store(cooldown=60)
+    assert codes.issue('a@x.com', '111111', 1000) is not None
+    assert codes.issue('a@x.com', '222222', 1059) is None
+    assert codes.cooldown_remaining('a@x.com', 1030) == 30
+    assert codes.check('a@x.com', '111111', 1059) == VALID
+    assert codes.issue('a@x.com', '333333', 1060) is not None
+    assert codes.check('a@x.com', '111111', 1061) == INVALID
+    assert codes.check('a@x.com', '333333', 1061) == VALID
+
+
+def test_expired_code_is_reported_once(make_store):
+    codes = make_store(ttl=600)
+    codes.issue('a@x.com', '111111', 1000)
+    assert codes.check('a@x.com', '111111', 1600) == VALID
+    assert codes.check('a@x.com', '111111', 1601) == EXPIRED
+    assert codes.check('a@x.com', '111111', 1602) == INVALID
+
+
+def test_consume_makes_a_code_single_use(make_store):
+    codes = make_store()
+    codes.issue('a@x.com', '111111', 1000)
+    codes.consume('a@x.com')
+    assert codes.check('a@x.com', '111111', 1001) == INVALID
+
+
+def test_emails_are_case_insensitive(make_store):
+    codes = make_store(cooldown=60)
+    codes.issue(' A@X.com', '111111', 1000)
+    assert codes.issue('a@x.COM', '222222', 1001) is None
+    assert codes.check('a@x.com', '111111', 1001) == VALID
+    codes.consume('A@x.com')
+    assert len(codes) == 0
+
+
+def test_oldest_codes_are_evicted_past_max_entries(make_store):
+    codes = make_store(max_entries=3)
+    for i in range(5):
+        codes.issue(f'user{i}@x.com', '111111', 1000 + i)
+    codes.purge(1005)
+    assert len(codes) == 3
+    assert codes.check('user0@x.com', '111111', 1005) == INVALID
+    assert codes.check('user4@x.com', '111111', 1005) == VALID
+
+
+def test_purge_drops_expired_codes(make_store):
+    codes = make_store(ttl=600)
+    codes.issue('old@x.com', '111111', 1000)
+    codes.issue('new@x.com', '222222', 1500)
+    codes.purge(1700)
+    assert len(codes) == 1
+
+
+def test_cooldown_holds_across_processes(tmp_path):
+    # Two stores on one journal or database behave like two gunicorn workers.
+    journal_a = Journal(str(tmp_path / 'codes.json'), key='email')
+    journal_b = Journal(str(tmp_path / 'codes.json'), key='email')
+    pairs = [
+        (CodeStore(journal_a.load(), journal=journal_a), CodeStore(journal_b.load(), journal=journal_b)),
+        (SQLiteCodeStore(str(tmp_path / 'codes.db')), SQLiteCodeStore(str(tmp_path / 'codes.db'))),
+    ]
+    for first, second in pairs:
+        assert first.issue('a@x.com', '111111', 1000) is not None
+        assert second.issue('a@x.com', '222222', 1001) is None
+        assert second.check('a@x.com', '111111', 1002) == VALID
@@ -0,0 +1,144 @@
+import json
+import os
+
+import pytest
+
+from code_store import CodeStore
+from journal import Journal
+from user_store import UserStore
+
+
+def user(name, password='p'):
+    return {'username': name, 'email': f'{name}@example.com', 'password': password}
+
+
+def write_lines(path, entries, tail=b''):
+    with open(path, 'wb') as f:
+        for entry in entries:
+            f.write(json.dumps(entry).encode() + b'\n')
+        f.write(tail)
+
+
+def test_torn_tail_is_skipped_then_truncated(tmp_path):
+    path = str(tmp_path / 'users.json')
+    write_lines(path + '.journal', [
+        {'op': 'segment', 'seq': 1},
+        {'op': 'put', 'value': user('alice')},
+    ], tail=b'{"op":"put","value":{"username":"bo')
+
+    journal = Journal(path, key='username')
+    store = UserStore(journal.load(), journal=journal)
+    assert [u['username'] for u in store] == ['alice']
+
+    store.add(user('carol'))
+    with open(path + '.journal', 'rb') as f:
+        lines = f.read().split(b'\n')
+    assert lines[-1] == b''
+    assert [json.loads(line)['op'] for line in lines[:-1]] == ['segment', 'put', 'put']
+    assert sorted(u['username'] for u in Journal(path, key='username').load()) == ['alice', 'carol']
+
+
+def test_legacy_journal_without_header(tmp_path):
+    path = str(tmp_path / 'codes.json')
+    write_lines(path + '.journal', [
+        {'op': 'put', 'value': {'email': 'a@x.com', 'code': '1', 'timestamp': 0}},
+        {'op': 'delete', 'key': 'a@x.com'},
+        {'op': 'put', 'value': {'email': 'b@x.com', 'code': '2', 'timestamp': 0}},
+    ])
+    assert [r['email'] for r in Journal(path, key='email').load()] == ['b@x.com']
+
+
+def test_crash_mid_compaction_reapplies_old_segment(tmp_path):
+    # The snapshot was replaced but the rotated segment was never unlinked,
+    # so it is replayed on top of a snapshot that already includes it.
+    path = str(tmp_path / 'users.json')
+    with open(path, 'w') as f:
+        json.dump([user('alice', 'new'), user('bob')], f)
+    write_lines(path + '.journal.old', [
+        {'op': 'segment', 'seq': 1},
+        {'op': 'put', 'value': user('alice', 'old')},
+        {'op': 'put', 'value': user('bob')},
+        {'op': 'put', 'value': user('alice', 'new')},
+    ])
+    write_lines(path + '.journal', [
+        {'op': 'segment', 'seq': 2},
+        {'op': 'put', 'value': user('carol')},
+    ])
+
+    records = {u['username']: u for u in Journal(path, key='username').load()}
+    assert sorted(records) == ['alice', 'bob', 'carol']
+    assert records['alice']['password'] == 'new'
+
+
+def test_crash_between_link_and_new_segment(tmp_path):
+    path = str(tmp_path / 'users.json')
+    write_lines(path + '.journal', [
+        {'op': 'segment', 'seq': 1},
+        {'op': 'put', 'value': user('alice')},
+    ])
+    os.link(path + '.journal', path + '.journal.old')
+    assert [u['username'] for u in Journal(path, key='username').load()] == ['alice']
+
+
+def test_next_writer_finishes_abandoned_compaction(tmp_path):
+    path = str(tmp_path / 'users.json')
+    write_lines(path + '.journal.old', [
+        {'op': 'segment', 'seq': 1},
+        {'op': 'put', 'value': user('alice')},
+    ])
+    write_lines(path + '.journal', [{'op': 'segment', 'seq': 2}])
+
+    journal = Journal(path, key='username', compact_min_bytes=0)
+    store = UserStore(journal.load(), journal=journal)
+    store.add(user('bob'))
+    journal._compactor.join()
+
+    assert not os.path.exists(path + '.journal.old')
+    with open(path) as f:
+        assert sorted(u['username'] for u in json.load(f)) == ['alice', 'bob']
+    assert sorted(u['username'] for u in Journal(path, key='username').load()) == ['alice', 'bob']
+
+
+def test_background_compaction_keeps_every_write(tmp_path):
+    path = str(tmp_path / 'users.json')
+    journal = Journal(path, key='username', compact_min_bytes=500, compact_ratio=0.5)
+    store = UserStore(journal.load(), journal=journal)
+    for i in range(200):
+        store.add(user(f'user{i}'))
+        store.set_password(f'user{i // 2}@example.com', f'pw{i}')
+    if journal._compactor is not None:
+        journal._compactor.join()
+
+    assert os.path.exists(path)
+    reloaded = {u['username']: u for u in Journal(path, key='username').load()}
+    assert reloaded == {u['username']: u for u in store}
+
+
+def test_writers_in_two_processes_see_each_other(tmp_path):
+    # Two Journal objects hold separate flocks, like two worker processes.
+    path = str(tmp_path / 'users.json')
+    journal_a = Journal(path, key='username')
+    store_a = UserStore(journal_a.load(), journal=journal_a)
+    journal_b = Journal(path, key='username')
+    store_b = UserStore(journal_b.load(), journal=journal_b)
+
+    store_a.add(user('alice'))
+    assert store_b.username_taken('alice')
+    store_b.add(user('bob'))
+    store_a.set_password('bob@example.com', 'changed')
+    assert store_b.get_by_username('bob')['password'] == 'changed'
+    assert sorted(u['username'] for u in Journal(path, key='username').load()) == ['alice', 'bob']
+
+
+def test_failed_append_leaves_store_unchanged(tmp_path, monkeypatch):
+    path = str(tmp_path / 'codes.json')
+    journal = Journal(path, key='email')
+    codes = CodeStore(journal.load(), journal=journal)
+
+    def fail(entry):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(journal, '_append', fail)
+    with pytest.raises(OSError):
+        codes.issue('a@x.com', '123456', 0)
+    assert len(codes) == 0
@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.brevo_stub import BrevoStub
+from outbox import Outbox
+
+
+@pytest.fixture
+def stub():
+    server = BrevoStub().start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_outbox(stub, tmp_path, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return Outbox(stub.url, 'test-key', dead_letter_path=str(tmp_path / 'dead.jsonl'), **kwargs)
+
+
+def dead_letters(tmp_path):
+    path = tmp_path / 'dead.jsonl'
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_messages_are_delivered(stub, tmp_path):
+    outbox = make_outbox(stub, tmp_path, workers=2)
+    for i in range(5):
+        assert outbox.enqueue(f'user{i}@x.com', 'Subject', '<p>hi</p>')
+    assert outbox.flush(timeout=10)
+    assert sorted(stub.received) == [f'user{i}@x.com' for i in range(5)]
+    assert (outbox.sent, outbox.failed) == (5, 0)
+
+
+def test_batches_use_message_versions(stub, tmp_path):
+    outbox = make_outbox(stub, tmp_path, workers=1, batch_size=10)
+    outbox.queue.put({"email": 'a@x.com', "subject": 'S', "htmlContent": 'a'})
+    outbox.queue.put({"email": 'b@x.com', "subject": 'S', "htmlContent": 'b'})
+    outbox._start()
+    assert outbox.flush(timeout=10)
+    assert sorted(stub.received) == ['a@x.com', 'b@x.com']
+    assert stub.requests == 1
+
+
+def test_server_errors_are_retried_then_dead_lettered(stub, tmp_path):
+    stub.failure_rate = 1.0
+    outbox = make_outbox(stub, tmp_path, workers=1, max_retries=3)
+    outbox.enqueue('a@x.com', 'Subject', '<p>hi</p>')
+    assert outbox.flush(timeout=10)
+    assert stub.requests == 4
+    assert (outbox.sent, outbox.failed) == (0, 1)
+    [letter] = dead_letters(tmp_path)
+    assert letter['email'] == 'a@x.com'
+    assert letter['error'].startswith('HTTP 503')
+
+
+def test_transient_errors_recover(stub, tmp_path, monkeypatch):
+    # Fail the first two attempts, then let the stub succeed.
+    outcomes = iter([0.0, 0.0])
+    monkeypatch.setattr('benchmarks.brevo_stub.random', SimpleNamespace(random=lambda: next(outcomes, 1.0)))
+    stub.failure_rate = 0.5
+    outbox = make_outbox(stub, tmp_path, workers=1, max_retries=3)
+    outbox.enqueue('a@x.com', 'Subject', '<p>hi</p>')
+    assert outbox.flush(timeout=10)
+    assert stub.received == ['a@x.com']
+    assert stub.requests == 3
+    assert dead_letters(tmp_path) == []
+
+
+def test_close_dead_letters_what_is_left(stub, tmp_path):
+    stub.latency = 0.5
+    outbox = make_outbox(stub, tmp_path, workers=1)
+    for i in range(3):
+        outbox.enqueue(f'user{i}@x.com', 'Subject', '<p>hi</p>')
+    outbox.close(timeout=0.1)
+    assert {letter['error'] for letter in dead_letters(tmp_path)} == {'shutdown'}
+    assert len(dead_letters(tmp_path)) == 2
+
+
+def test_missing_api_key_refuses_to_queue(stub, tmp_path):
+    outbox = Outbox(stub.url, None, dead_letter_path=str(tmp_path / 'dead.jsonl'))
+    assert outbox.enqueue('a@x.com', 'Subject', '<p>hi</p>') is False
@@ -0,0 +1,25 @@
+import os
+import signal
+
+from passwords import PasswordHasher
+
+
+def test_pool_is_rebuilt_after_a_child_dies():
+    hasher = PasswordHasher(n=2 ** 10, workers=1)
+    try:
+        stored = hasher.hash('secret')
+        for process in list(hasher._pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        assert hasher.verify('secret', stored) == (True, False)
+        assert hasher.verify('wrong', hasher.hash('secret')) == (False, False)
+    finally:
+        hasher._pool.shutdown()
+
+
+def test_inline_hashing_round_trips():
+    hasher = PasswordHasher(n=2 ** 10, workers=0)
+    stored = hasher.hash('secret')
+    assert stored.startswith('scrypt$v1$n=1024,r=8,p=1$')
+    assert hasher.verify('secret', stored) == (True, False)
+    assert PasswordHasher(n=2 ** 11, workers=0).verify('secret', stored) == (True, True)
@@ -0,0 +1,83 @@
+from flask import Flask, jsonify
+
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets, parse_rate
+
+
+def make_app(store=None):
+    app = Flask(__name__)
+    limiter = RateLimiter(store)
+
+    @app.route('/login', methods=['POST'])
+    @limiter.limit(ip="5/minute", identifier="1/minute", field='email')
+    def login():
+        return jsonify({"ok": True})
+
+    @app.route('/other', methods=['POST'])
+    @limiter.limit(ip="2/minute")
+    def other():
+        return jsonify({"ok": True})
+
+    return app.test_client()
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 10 / 60)
+    assert parse_rate("3/second") == (3, 3)
+
+
+def test_exceeding_the_ip_limit_returns_429_with_retry_after():
+    client = make_app()
+    assert client.post('/other').status_code == 200
+    assert client.post('/other').status_code == 200
+    response = client.post('/other')
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+
+
+def test_routes_have_separate_buckets():
+    client = make_app()
+    client.post('/other')
+    client.post('/other')
+    assert client.post('/other').status_code == 429
+    assert client.post('/login', json={"email": "a@x.com"}).status_code == 200
+
+
+def test_identifier_limit_is_case_insensitive_and_per_value():
+    client = make_app()
+    assert client.post('/login', json={"email": "a@x.com"}).status_code == 200
+    assert client.post('/login', json={"email": " A@X.com"}).status_code == 429
+    assert client.post('/login', json={"email": "b@x.com"}).status_code == 200
+
+
+def test_clients_have_separate_ip_buckets():
+    client = make_app()
+    for _ in range(2):
+        client.post('/other', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    assert client.post('/other', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 429
+    assert client.post('/other', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_tokens_refill_over_time():
+    buckets = MemoryBuckets()
+    assert buckets.take('k', 1, 1.0, 100) == 0
+    assert buckets.take('k', 1, 1.0, 100.25) == 0.75
+    assert buckets.take('k', 1, 1.0, 101.5) == 0
+
+
+def test_least_recently_used_bucket_is_evicted():
+    buckets = MemoryBuckets(max_buckets=2)
+    buckets.take('a', 1, 0.001, 0)
+    buckets.take('b', 1, 0.001, 0)
+    buckets.take('a', 1, 0.001, 1)
+    buckets.take('c', 1, 0.001, 2)
+    assert list(buckets.buckets) == ['a', 'c']
+    # 'b' was forgotten, so it starts again with a full bucket.
+    assert buckets.take('b', 1, 0.001, 3) == 0
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    first = SQLiteBuckets(str(tmp_path / 'ratelimit.db'))
+    second = SQLiteBuckets(str(tmp_path / 'ratelimit.db'))
+    assert first.take('k', 1, 1.0, 100) == 0
+    assert second.take('k', 1, 1.0, 100) == 1.0
+    assert make_app(second).post('/other').status_code == 200
@@ -0,0 +1,60 @@
+from tokens import ACCESS, REFRESH, TokenSigner, _b64, _unb64
+
+NOW = 1_700_000_000
+
+
+def signer():
+    return TokenSigner('test-secret', access_ttl=60, refresh_ttl=3600)
+
+
+def test_valid_token_round_trips():
+    tokens = signer()
+    claims = tokens.verify(tokens.issue('alice', now=NOW), now=NOW + 1)
+    assert claims['sub'] == 'alice'
+    assert claims['typ'] == ACCESS
+
+
+def test_tampered_payload_is_rejected():
+    tokens = signer()
+    payload, signature = tokens.issue('alice', now=NOW).split('.')
+    forged = _b64(_unb64(payload).replace(b'"alice"', b'"admin"'))
+    assert tokens.verify(f'{forged}.{signature}', now=NOW) is None
+
+
+def test_tampered_signature_is_rejected():
+    tokens = signer()
+    payload, signature = tokens.issue('alice', now=NOW).split('.')
+    flipped = ('A' if signature[0] != 'A' else 'B') + signature[1:]
+    assert tokens.verify(f'{payload}.{flipped}', now=NOW) is None
+
+
+def test_token_from_another_secret_is_rejected():
+    token = TokenSigner('other-secret').issue('alice', now=NOW)
+    assert signer().verify(token, now=NOW) is None
+
+
+def test_expired_token_is_rejected():
+    tokens = signer()
+    token = tokens.issue('alice', now=NOW)
+    assert tokens.verify(token, now=NOW + 59) is not None
+    assert tokens.verify(token, now=NOW + 60) is None
+
+
+def test_revoked_token_is_rejected():
+    tokens = signer()
+    token = tokens.issue('alice')
+    tokens.revoke(tokens.verify(token))
+    assert tokens.verify(token) is None
+
+
+def test_wrong_token_type_is_rejected():
+    tokens = signer()
+    assert tokens.verify(tokens.issue('alice', REFRESH, now=NOW), ACCESS, now=NOW) is None
+
+
+def test_malformed_tokens_are_rejected():
+    tokens = signer()
+    payload, signature = tokens.issue('alice', now=NOW).split('.')
+    for token in (None, '', 'abc', 'a.b.c', f'{payload}.é{signature}', 'ünïcødé.ßig',
+                  f'{payload}ÿ.{signature}', f'{_b64(b"[1, 2]")}.{tokens._sign(_b64(b"[1, 2]"))}'):
+        assert tokens.verify(token, now=NOW) is None
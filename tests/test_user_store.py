@@ -0,0 +1,55 @@
+import pytest
+
+from user_store import UserStore
+
+
+def user(name, email, password):
+    return {'username': name, 'email': email, 'password': password}
+
+
+def legacy_store():
+    # Signups are checked case-insensitively now, but older data may hold
+    # names and emails that differ only by case.
+    return UserStore([
+        user('Bob', 'Bob@example.com', 'first'),
+        user('bob', 'bob@example.com', 'second'),
+        user('Carol', 'Carol@example.com', 'third'),
+    ])
+
+
+def test_exact_case_wins_over_folded_collisions():
+    store = legacy_store()
+    assert store.get_by_identifier('bob')['password'] == 'second'
+    assert store.get_by_identifier('Bob')['password'] == 'first'
+    assert store.get_by_identifier('BOB') is None
+    assert store.get_by_identifier('bob@example.com')['password'] == 'second'
+    assert store.get_by_identifier('BOB@example.com') is None
+
+
+def test_unique_folded_key_still_matches():
+    store = legacy_store()
+    assert store.get_by_identifier(' carol ')['username'] == 'Carol'
+    assert store.get_by_email('carol@EXAMPLE.com')['username'] == 'Carol'
+    assert store.username_taken('CAROL')
+    assert store.email_taken('CAROL@example.com')
+
+
+def test_get_by_username_is_exact():
+    store = legacy_store()
+    assert store.get_by_username('bob')['password'] == 'second'
+    assert store.get_by_username('carol') is None
+
+
+def test_set_password_never_resets_the_other_account():
+    store = legacy_store()
+    assert store.set_password('bob@example.com', 'new')['username'] == 'bob'
+    assert store.get_by_username('Bob')['password'] == 'first'
+    assert store.set_password('BOB@EXAMPLE.COM', 'new') is None
+
+
+def test_add_rejects_case_variants():
+    store = UserStore([user('Bob', 'Bob@example.com', 'p')])
+    with pytest.raises(ValueError, match="Username"):
+        store.add(user('bob', 'x@example.com', 'p'))
+    with pytest.raises(ValueError, match="Email"):
+        store.add(user('alice', 'bob@EXAMPLE.com', 'p'))
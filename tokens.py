@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class Denylist:
+    """Revoked token ids, each kept only until the token would expire anyway."""
+
+    def __init__(self):
+        self.entries = {}
+        self.heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, jti):
+        return jti in self.entries
+
+    def add(self, jti, exp, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            while self.heap and self.heap[0][0] <= now:
+                _, old = heapq.heappop(self.heap)
+                self.entries.pop(old, None)
+            if exp > now:
+                self.entries[jti] = exp
+                heapq.heappush(self.heap, (exp, jti))
+
+
+class TokenSigner:
+    """Compact HMAC-SHA256 signed tokens: `<base64 claims>.<base64 signature>`.
+
+    Claims are `sub`, `typ` (access or refresh), `exp` and a random `jti`
+    used for revocation. Verification only checks the signature, expiry and
+    the denylist; it never looks the user up. Refresh tokens also carry
+    `pwd`, the user's password change time, which the refresh route compares
+    against the stored user so a password reset ends existing sessions.
+    """
+
+    def __init__(self, secret, access_ttl=900, refresh_ttl=30 * 24 * 3600):
+        if not secret:
+            raise ValueError("token secret must not be empty")
+        self.key = hashlib.sha256(b'turbinix-token:' + secret.encode()).digest()
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.denylist = Denylist()
+
+    def _sign(self, payload):
+        return _b64(hmac.new(self.key, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, sub, typ=ACCESS, now=None, extra=None):
+        now = time.time() if now is None else now
+        ttl = self.access_ttl if typ == ACCESS else self.refresh_ttl
+        claims = {"sub": sub, "typ": typ, "exp": int(now + ttl), "jti": _b64(os.urandom(9)), **(extra or {})}
+        payload = _b64(json.dumps(claims, separators=(',', ':')).encode())
+        return f"{payload}.{self._sign(payload)}"
+
+    def issue_pair(self, sub, password_changed_at=0):
+        return {
+            "access_token": self.issue(sub, ACCESS),
+            "refresh_token": self.issue(sub, REFRESH, extra={"pwd": password_changed_at}),
+            "token_type": "Bearer",
+            "expires_in": self.access_ttl
+        }
+
+    def verify(self, token, typ=ACCESS, now=None):
+        """Return the token's claims, or None if it is invalid, expired or revoked."""
+        try:
+            payload, signature = token.split('.')
+            # Compare bytes: compare_digest rejects non-ASCII str with TypeError.
+            if not hmac.compare_digest(signature.encode(), self._sign(payload).encode()):
+                return None
+            claims = json.loads(_unb64(payload))
+        except (AttributeError, ValueError, TypeError):
+            return None
+        if not isinstance(claims, dict):
+            return None
+        now = time.time() if now is None else now
+        if claims.get('typ') != typ or claims.get('exp', 0) <= now or claims.get('jti') in self.denylist:
+            return None
+        return claims
+
+    def revoke(self, claims):
+        self.denylist.add(claims['jti'], claims['exp'])
+
+    def required(self, view):
+        """Route decorator: reject requests without a valid Bearer access token."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            header = request.headers.get('Authorization', '')
+            token = header[7:] if header.startswith('Bearer ') else None
+            claims = self.verify(token)
+            if claims is None:
+                return jsonify({"error": "Invalid or expired token"}), 401
+            g.token = claims
+            return view(*args, **kwargs)
+        return wrapper
@@ -0,0 +1,159 @@
+import logging
+import threading
+
+from username_index import UsernameIndex, normalize_username
+
+
+log = logging.getLogger('turbinix.users')
+
+
+def normalize_email(email):
+    return (email or '').strip().casefold()
+
+
+class UserStore:
+    """In-memory user directory with O(1) lookups by username and email.
+
+    `users` stays the ordered list that gets persisted; the dicts index into
+    it and are kept in sync by every mutating method. `by_username` and
+    `by_email` are exact-case; `folded_usernames` and `folded_emails` map a
+    case-folded key to every user sharing it. New signups are checked
+    case-insensitively (`usernames` is the availability index), so "Bob"
+    and "bob" can only both exist in data from before that check. Lookups
+    try the exact key first and fall back to the folded key only when it
+    belongs to a single user, so one of those accounts never resolves to
+    the other.
+    When a `journal` is given, each mutation is appended to it before memory
+    changes, so a failed append leaves the store as it was; compaction
+    snapshots `users`. Mutations run inside `journal.writing()`, so the
+    check-then-insert in `add` is atomic across threads and worker
+    processes, and reads first pick up what other workers wrote.
+    """
+
+    def __init__(self, users=None, journal=None):
+        self.journal = journal
+        self._lock = journal.lock if journal is not None else threading.RLock()
+        self._reset(users or [])
+        if journal is not None:
+            journal.source = lambda: self.users
+            journal.on_entry = self._replay
+            journal.on_reload = self._reset
+
+    def _reset(self, users):
+        # Readers don't lock, so build the indexes aside and swap them in.
+        indexes = ([], {}, {}, {}, {})
+        for user in users:
+            self._index_into(user, *indexes)
+        self.users, self.by_username, self.by_email, self.folded_usernames, self.folded_emails = indexes
+        self.usernames = UsernameIndex(self.by_username)
+        clashes = sum(len(v) > 1 for v in self.folded_usernames.values())
+        clashes += sum(len(v) > 1 for v in self.folded_emails.values())
+        if clashes:
+            log.warning("usernames or emails differing only by case", extra={"count": clashes})
+
+    def _replay(self, entry):
+        if entry['op'] == 'put':
+            user = entry['value']
+            current = self.by_username.get(user['username'])
+            if current is not None:
+                current.update(user)
+            else:
+                self._index(user)
+                self.usernames.add(user['username'])
+        elif entry['op'] == 'delete':
+            self._reset([u for u in self.users if u.get('username') != entry['key']])
+
+    def _writing(self):
+        return self.journal.writing() if self.journal is not None else self._lock
+
+    def _refresh(self):
+        if self.journal is not None:
+            self.journal.refresh()
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        return iter(self.users)
+
+    def _index(self, user):
+        self._index_into(user, self.users, self.by_username, self.by_email,
+                         self.folded_usernames, self.folded_emails)
+
+    @staticmethod
+    def _index_into(user, users, by_username, by_email, folded_usernames, folded_emails):
+        users.append(user)
+        username = user.get('username')
+        if username is not None:
+            by_username.setdefault(username, user)
+            folded_usernames.setdefault(normalize_username(username), []).append(user)
+        email = (user.get('email') or '').strip()
+        if email:
+            by_email.setdefault(email, user)
+            folded_emails.setdefault(normalize_email(email), []).append(user)
+
+    @staticmethod
+    def _match(exact, folded, key, folded_key):
+        user = exact.get(key)
+        if user is None:
+            matches = folded.get(folded_key, ())
+            if len(matches) == 1:
+                user = matches[0]
+        return user
+
+    def get_by_username(self, username):
+        """Exact-case lookup, for names that came from a token."""
+        self._refresh()
+        return self.by_username.get(username)
+
+    def get_by_email(self, email):
+        self._refresh()
+        email = (email or '').strip()
+        return self._match(self.by_email, self.folded_emails, email, normalize_email(email))
+
+    def get_by_identifier(self, identifier):
+        self._refresh()
+        identifier = (identifier or '').strip()
+        user = self._match(self.by_username, self.folded_usernames, identifier, normalize_username(identifier))
+        return user or self.get_by_email(identifier)
+
+    def username_taken(self, username):
+        self._refresh()
+        return username in self.usernames
+
+    def email_taken(self, email):
+        self._refresh()
+        return normalize_email(email) in self.folded_emails
+
+    def check_usernames(self, usernames):
+        self._refresh()
+        return self.usernames.check_many(usernames)
+
+    def suggest_usernames(self, username, count):
+        self._refresh()
+        return self.usernames.suggest(username, count)
+
+    def add(self, user):
+        with self._writing():
+            if self.username_taken(user['username']):
+                raise ValueError("Username already taken")
+            if self.email_taken(user['email']):
+                raise ValueError("Email already used")
+            if self.journal is not None:
+                self.journal.put(user)
+            self._index(user)
+            self.usernames.add(user['username'])
+            return user
+
+    def set_password(self, email, password, changed_at=None):
+        with self._writing():
+            user = self.get_by_email(email)
+            if user is None:
+                return None
+            updated = dict(user, password=password)
+            if changed_at is not None:
+                updated['password_changed_at'] = changed_at
+            if self.journal is not None:
+                self.journal.put(updated)
+            user.update(updated)
+            return user
@@ -0,0 +1,111 @@
+import bisect
+import hashlib
+import math
+
+SUGGEST_SCAN_LIMIT = 256
+
+
+def normalize_username(username):
+    return (username or '').strip().casefold()
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1024)
+        self.size = int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class UsernameIndex:
+    """Case-insensitive set of taken usernames.
+
+    Names are kept normalized in a sorted list, which answers membership by
+    bisection and suggestion queries by range scans. A Bloom filter in front
+    answers most "available" lookups without touching the list; it is rebuilt
+    at double capacity whenever it fills up.
+    """
+
+    def __init__(self, usernames=()):
+        self.names = sorted({normalize_username(u) for u in usernames})
+        self._rebuild_bloom()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rebuild_bloom(self):
+        # Readers don't lock, so only publish the filter once it is full.
+        bloom = BloomFilter(2 * len(self.names))
+        for name in self.names:
+            bloom.add(name)
+        self.bloom = bloom
+
+    def _contains(self, key):
+        if key not in self.bloom:
+            return False
+        i = bisect.bisect_left(self.names, key)
+        return i < len(self.names) and self.names[i] == key
+
+    def __contains__(self, username):
+        return self._contains(normalize_username(username))
+
+    def add(self, username):
+        key = normalize_username(username)
+        if self._contains(key):
+            return False
+        bisect.insort(self.names, key)
+        if self.bloom.count >= self.bloom.capacity:
+            self._rebuild_bloom()
+        else:
+            self.bloom.add(key)
+        return True
+
+    def check_many(self, usernames):
+        return {username: username not in self for username in usernames}
+
+    def suggest(self, username, count=5):
+        """Return `count` free names of the form `<base><number>`.
+
+        `base` is the name without trailing digits, and is itself offered
+        first when it is free. Names after `base` that start with a digit form
+        one contiguous range of the sorted list (digits sort between '0' and
+        ':'). A small range is read in full and the lowest free numbers are
+        returned. A large one means the low numbers are crowded, so numbers
+        are taken from just above its size, checked through the Bloom filter.
+        """
+        base = username.strip().rstrip('0123456789') or username.strip()
+        key = normalize_username(base)
+        lo = bisect.bisect_left(self.names, key + '0')
+        hi = bisect.bisect_left(self.names, key + ':')
+
+        suggestions = []
+        if key != normalize_username(username) and not self._contains(key):
+            suggestions.append(base)
+        if hi - lo <= SUGGEST_SCAN_LIMIT:
+            taken = {name[len(key):] for name in self.names[lo:hi]}
+            n = 1
+        else:
+            taken = ()
+            n = hi - lo + 1
+        while len(suggestions) < count:
+            suffix = str(n)
+            if suffix not in taken and not self._contains(key + suffix):
+                suggestions.append(f"{base}{suffix}")
+            n += 1
+        return suggestions
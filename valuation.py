@@ -0,0 +1,121 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+SUFFIXES = {
+    'street': 'st', 'avenue': 'ave', 'av': 'ave', 'road': 'rd', 'drive': 'dr',
+    'boulevard': 'blvd', 'lane': 'ln', 'court': 'ct', 'place': 'pl',
+    'terrace': 'ter', 'circle': 'cir', 'highway': 'hwy', 'parkway': 'pkwy',
+    'square': 'sq', 'apartment': 'apt', 'suite': 'ste',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+}
+
+_PUNCTUATION = re.compile(r"[.,#']")
+
+
+def normalize_address(address):
+    words = _PUNCTUATION.sub(' ', (address or '').lower()).split()
+    return ' '.join(SUFFIXES.get(word, word) for word in words)
+
+
+DEFAULT_VALUATION = {
+    'value': 480000,
+    'change': '+1.0%',
+    'image': 'https://images.unsplash.com/photo-1600607687920-4ff6f5ef9c07',
+}
+
+
+class MockDataSource:
+    """Fixed local data standing in for a real property data provider.
+
+    Data sources implement `fetch_many(keys)`, taking normalized addresses
+    and returning a dict with an entry for every address they know about.
+    """
+
+    def __init__(self, properties=None):
+        self.properties = properties if properties is not None else {
+            '123 main st': {
+                'value': 542000,
+                'change': '+3.2%',
+                'image': 'https://source.unsplash.com/featured/400x200?house',
+            },
+            '456 elm st': {
+                'value': 610000,
+                'change': '-1.1%',
+                'image': 'https://source.unsplash.com/featured/400x200?modern-home',
+            }
+        }
+        self.calls = 0
+
+    def fetch_many(self, keys):
+        self.calls += 1
+        return {key: self.properties[key] for key in keys if key in self.properties}
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize=10_000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self.data[key] = (now + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+
+class ValuationEngine:
+    def __init__(self, source=None, cache=None, default=DEFAULT_VALUATION):
+        self.source = source if source is not None else MockDataSource()
+        self.cache = cache if cache is not None else TTLCache()
+        self.default = default
+
+    def value(self, address):
+        return self.value_many([address])[0]
+
+    def value_many(self, addresses):
+        """Value a list of addresses with at most one data source call.
+
+        Addresses are normalized and de-duplicated first, so every distinct
+        property is fetched at most once; results come back in input order.
+        """
+        keys = [normalize_address(address) for address in addresses]
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                found[key] = cached
+
+        if missing:
+            fetched = self.source.fetch_many(missing)
+            for key in missing:
+                result = fetched.get(key, self.default)
+                self.cache.set(key, result)
+                found[key] = result
+
+        return [found[key] for key in keys]